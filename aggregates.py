@@ -0,0 +1,61 @@
+from datetime import datetime
+
+# Running totals for a ledger, grouped by 'YYYY-MM'. Built once from the
+# full ledger and then kept current by apply() as entries are appended, so
+# totals and monthly rows never need a pass over the whole file.
+
+class LedgerAggregate:
+    def __init__(self):
+        self.total = 0
+        self.count = 0
+        self.by_month = {}
+
+    @classmethod
+    def build(cls, rows):
+        aggregate = cls()
+        aggregate.add(rows)
+        return aggregate
+
+    @staticmethod
+    def apply(aggregate, new_rows):
+        aggregate.add(new_rows)
+        return aggregate
+
+    def add(self, rows):
+        for row in rows:
+            amount = row['amount']
+            month = row['date'][:7]
+            self.total += amount
+            self.count += 1
+            self.by_month[month] = self.by_month.get(month, 0) + amount
+
+    def differences(self, other):
+        problems = []
+        if self.count != other.count:
+            problems.append(f"count {self.count} != {other.count}")
+        if self.total != other.total:
+            problems.append(f"total {self.total} != {other.total}")
+        for month in sorted(set(self.by_month) | set(other.by_month)):
+            if self.by_month.get(month) != other.by_month.get(month):
+                problems.append(f"{month} {self.by_month.get(month)} != {other.by_month.get(month)}")
+        return problems
+
+def month_label(month):
+    return datetime(int(month[:4]), int(month[5:7]), 1).strftime('%B %Y')
+
+def monthly_rows(funds_by_month, expenses_by_month):
+    # Most recent month first; 'YYYY-MM' keys sort chronologically as strings
+    months = sorted(set(funds_by_month) | set(expenses_by_month), reverse=True)
+
+    monthly_summary = []
+    for month in months:
+        funds_amount = funds_by_month.get(month, 0)
+        expenses_amount = expenses_by_month.get(month, 0)
+        monthly_summary.append({
+            'month': month_label(month),
+            'funds': funds_amount,
+            'expenses': expenses_amount,
+            'balance': funds_amount - expenses_amount
+        })
+
+    return monthly_summary
@@ -0,0 +1,227 @@
+import hashlib
+from datetime import datetime
+from functools import wraps
+from flask import jsonify, request
+from flask_login import current_user
+from app import app, initialize
+from models import Fund, Expense, FundSubmission, Member, Federation
+from helpers import get_monthly_summary
+from storage import ledger_cache, current_club
+from jobs import Job
+
+# Read-only JSON API, versioned under /api/v1.
+#
+# Listings take the same page/per_page/cursor/start/end parameters as the
+# HTML pages, plus:
+#   fields=id,amount   only return these fields of each entry
+#   since=42           only entries added after id 42, oldest first
+#                      (status changes of submissions keep their id, so
+#                      refetch those by status instead)
+#   since=2025-05-01   only entries dated on or after that day
+# Amounts, totals included, are integer poisha (1 taka = 100 poisha).
+# Responses carry an ETag that changes with the underlying table, so
+# clients polling with If-None-Match get 304s until something changes.
+
+MAX_PER_PAGE = 500
+
+def api_login_required(admin=False):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not current_user.is_authenticated:
+                return jsonify(error='authentication required'), 401
+            if admin and not current_user.is_admin:
+                return jsonify(error='admin access required'), 403
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def _date_arg(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').strftime('%Y-%m-%d')
+    except ValueError:
+        return None
+
+def _select_fields(items):
+    fields = [field.strip() for field in request.args.get('fields', '').split(',') if field.strip()]
+    if not fields:
+        return items
+    return [{field: item[field] for field in fields if field in item} for item in items]
+
+def _conditional(payload, *tables):
+    # ETag from the tables' version and the exact query, same in every worker
+    tag = f"{ledger_cache.version(*tables)}:{request.full_path}"
+    response = jsonify(payload)
+    response.set_etag(hashlib.sha1(tag.encode()).hexdigest()[:24])
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+def _listing(model, table, **filters):
+    per_page = min(max(request.args.get('per_page', 50, type=int), 1), MAX_PER_PAGE)
+    since = request.args.get('since', '')
+
+    if since.isdigit():
+        items = model.get_changes(int(since), per_page)
+        payload = {
+            'items': _select_fields(items),
+            'since': int(since),
+            'next_since': items[-1]['id'] if items else int(since),
+            'has_more': len(items) == per_page,
+        }
+        return _conditional(payload, table)
+
+    start = _date_arg('since') or _date_arg('start')
+    page = model.get_page(
+        page=request.args.get('page', 1, type=int),
+        per_page=per_page,
+        start=start,
+        end=_date_arg('end'),
+        cursor=request.args.get('cursor') or None,
+        **filters
+    )
+    payload = {
+        'items': _select_fields(page.items),
+        'page': page.page,
+        'per_page': page.per_page,
+        'pages': page.pages,
+        'total': page.total,
+        'next_cursor': page.next_cursor,
+    }
+    return _conditional(payload, table)
+
+@app.route('/api/v1/funds')
+@api_login_required()
+def api_funds():
+    return _listing(Fund, 'funds', method=request.args.get('method') or None)
+
+@app.route('/api/v1/expenses')
+@api_login_required()
+def api_expenses():
+    return _listing(Expense, 'expenses')
+
+@app.route('/api/v1/submissions')
+@api_login_required(admin=True)
+def api_submissions():
+    return _listing(FundSubmission, 'fund_submissions', status=request.args.get('status') or None)
+
+# What /api/v1/search looks in, and who may
+SEARCHES = {
+    'funds': (Fund, 'funds', False),
+    'expenses': (Expense, 'expenses', False),
+    'submissions': (FundSubmission, 'fund_submissions', True),
+}
+
+@app.route('/api/v1/search')
+@api_login_required()
+def api_search():
+    # ?q=rahim&in=funds,expenses&start=&end=&min_amount=&max_amount=&method=&status=
+    # Every word of q must match the start of a word in a text field
+    # (names, titles, reasons, transaction ids). Amounts are poisha; method
+    # and status only apply where the table has them. Each table gets its
+    # own page of results.
+    kinds = [kind.strip() for kind in request.args.get('in', 'funds,expenses,submissions').split(',') if kind.strip()]
+    unknown = [kind for kind in kinds if kind not in SEARCHES]
+    if unknown:
+        return jsonify(error=f"cannot search {', '.join(unknown)}"), 400
+    if not current_user.is_admin:
+        kinds = [kind for kind in kinds if not SEARCHES[kind][2]]
+        if not kinds:
+            return jsonify(error='admin access required'), 403
+
+    filters = {
+        'query': request.args.get('q') or None,
+        'start': _date_arg('start'),
+        'end': _date_arg('end'),
+        'min_amount': request.args.get('min_amount', type=int),
+        'max_amount': request.args.get('max_amount', type=int),
+        'page': request.args.get('page', 1, type=int),
+        'per_page': min(max(request.args.get('per_page', 50, type=int), 1), MAX_PER_PAGE),
+    }
+    method = request.args.get('method') or None
+    status = request.args.get('status') or None
+
+    results = {}
+    for kind in kinds:
+        model = SEARCHES[kind][0]
+        if model is Fund:
+            page = model.search(method=method, **filters)
+        elif model is FundSubmission:
+            page = model.search(method=method, status=status, **filters)
+        else:
+            page = model.search(**filters)
+        results[kind] = {
+            'items': _select_fields(page.items),
+            'page': page.page,
+            'pages': page.pages,
+            'total': page.total,
+        }
+
+    return _conditional({'results': results}, *[SEARCHES[kind][1] for kind in kinds])
+
+@app.route('/api/v1/summary')
+def api_summary():
+    # start/end limit every figure to that date range
+    start, end = _date_arg('start'), _date_arg('end')
+    if start or end:
+        total_funds = Fund.get_range_total(start, end)
+        total_expenses = Expense.get_range_total(start, end)
+    else:
+        total_funds = Fund.get_total()
+        total_expenses = Expense.get_total()
+
+    payload = {
+        'total_funds': total_funds,
+        'total_expenses': total_expenses,
+        'current_balance': total_funds - total_expenses,
+        'funds_by_method': Fund.get_method_totals(start, end),
+        'monthly_summary': get_monthly_summary(start, end),
+    }
+    return _conditional(payload, 'funds', 'expenses')
+
+@app.route('/api/v1/members')
+@api_login_required(admin=True)
+def api_members():
+    # Every member with their total paid, all time or for ?year=2025
+    year = request.args.get('year', '')
+    year = year if len(year) == 4 and year.isdigit() else None
+    return _conditional({'year': year, 'items': _select_fields(Member.get_totals(year))}, 'members', 'funds')
+
+@app.route('/api/v1/members/<int:member_id>')
+@api_login_required(admin=True)
+def api_member_statement(member_id):
+    statement = Member.get_statement(member_id, _date_arg('start'), _date_arg('end'))
+    if statement is None:
+        return jsonify(error='member not found'), 404
+    return _conditional(statement, 'members', 'funds', 'fund_submissions')
+
+@app.route('/api/v1/jobs')
+@api_login_required(admin=True)
+def api_jobs():
+    # The most recent background jobs, newest first; poll with If-None-Match
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 200)
+    return _conditional({'items': Job.get_recent(limit)}, 'jobs')
+
+@app.route('/api/v1/jobs/<int:job_id>')
+@api_login_required(admin=True)
+def api_job(job_id):
+    job = Job.get(job_id)
+    if job is None:
+        return jsonify(error='job not found'), 404
+    return _conditional(job, 'jobs')
+
+@app.route('/api/v1/federation')
+@api_login_required(admin=True)
+def api_federation():
+    # Every club's totals and their sum, for admins of the federation
+    # itself (the site root, not a club)
+    if not ledger_cache.clubs or current_club() is not None:
+        return jsonify(error='not found'), 404
+
+    for club in ledger_cache.clubs:
+        with ledger_cache.using(club):
+            initialize()
+    return jsonify(Federation.get_summary())
@@ -1,69 +1,170 @@
 import os
 import logging
-import json
-from flask import Flask
+import threading
+import time
+from flask import Flask, session
+from werkzeug.middleware.proxy_fix import ProxyFix
 from werkzeug.security import generate_password_hash
 from flask_login import LoginManager
+from storage import TABLES, ledger_cache, create_backend, current_club
+from clubs import ClubMiddleware, parse_clubs, schema_name
+import metrics
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
+# Configure logging; LOG_LEVEL=DEBUG for the chatty version
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO').upper())
 
 # Initialize the app
 app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key")
 
-# Create uploads directory if it doesn't exist
-if not os.path.exists('static/uploads'):
-    os.makedirs('static/uploads')
-
 # Initialize login manager
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
 
-# Create data files if they don't exist
+# Storage backend: 'json' (default), 'journal', 'sqlite' or 'postgresql'
+app.config['STORAGE_BACKEND'] = os.environ.get('STORAGE_BACKEND', 'json')
+app.config['DATABASE_URL'] = os.environ.get('DATABASE_URL', 'sqlite:///club_fund.db')
+# Journal mode: fsync after every write ('always'), at most once per
+# JOURNAL_FSYNC_INTERVAL seconds ('interval') or leave it to the OS ('never')
+app.config['JOURNAL_FSYNC'] = os.environ.get('JOURNAL_FSYNC', 'always')
+app.config['JOURNAL_FSYNC_INTERVAL'] = float(os.environ.get('JOURNAL_FSYNC_INTERVAL', '1.0'))
+app.config['JOURNAL_COMPACT_BYTES'] = int(os.environ.get('JOURNAL_COMPACT_BYTES', str(1024 * 1024)))
+
+backend_options = {}
+if app.config['STORAGE_BACKEND'] == 'journal':
+    backend_options = {
+        'fsync': app.config['JOURNAL_FSYNC'],
+        'fsync_interval': app.config['JOURNAL_FSYNC_INTERVAL'],
+        'compact_bytes': app.config['JOURNAL_COMPACT_BYTES'],
+    }
+
+# Several clubs in one deployment (see clubs.py): CLUBS=dhaka,sylhet gives
+# each its own ledgers under CLUBS_DIR/<club>/ (or Postgres schema
+# club_<club>), reached at /<club>/ or, with CLUB_ROUTING=subdomain,
+# <club>.CLUB_DOMAIN. Only the CLUB_CACHE_SIZE most recently used clubs are
+# kept in memory. Without CLUBS the app serves one club from the working
+# directory as before.
+app.config['CLUBS'] = parse_clubs(os.environ.get('CLUBS', ''))
+app.config['CLUBS_DIR'] = os.environ.get('CLUBS_DIR', 'clubs')
+app.config['CLUB_ROUTING'] = os.environ.get('CLUB_ROUTING', 'path')
+app.config['CLUB_DOMAIN'] = os.environ.get('CLUB_DOMAIN')
+app.config['CLUB_CACHE_SIZE'] = int(os.environ.get('CLUB_CACHE_SIZE', '8'))
+
+def create_club_backend(club):
+    data_dir = os.path.join(app.config['CLUBS_DIR'], club)
+    os.makedirs(data_dir, exist_ok=True)
+    return create_backend(app.config['STORAGE_BACKEND'], app.config['DATABASE_URL'], data_dir=data_dir,
+                          schema=schema_name(club), **backend_options)
+
+ledger_cache.configure(
+    create_backend(app.config['STORAGE_BACKEND'], app.config['DATABASE_URL'], **backend_options),
+    clubs=app.config['CLUBS'],
+    club_backend=create_club_backend,
+    max_clubs=app.config['CLUB_CACHE_SIZE']
+)
+
+# Request instrumentation (see metrics.py): timing headers, /metrics and
+# opt-in cProfile dumps
+app.config['METRICS_HEADERS'] = os.environ.get('METRICS_HEADERS') == '1'
+app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+app.config['PROFILE_DIR'] = os.environ.get('PROFILE_DIR')
+app.config['PROFILE_ALL'] = os.environ.get('PROFILE_ALL') == '1'
+metrics.init_app(app)
+
+# Public submission form (see intake.py): token buckets per IP address and
+# per mobile number, and a bounded queue in front of the batching writer
+app.config['SUBMIT_IP_PER_MINUTE'] = float(os.environ.get('SUBMIT_IP_PER_MINUTE', '6'))
+app.config['SUBMIT_IP_BURST'] = int(os.environ.get('SUBMIT_IP_BURST', '5'))
+app.config['SUBMIT_MOBILE_PER_MINUTE'] = float(os.environ.get('SUBMIT_MOBILE_PER_MINUTE', '2'))
+app.config['SUBMIT_MOBILE_BURST'] = int(os.environ.get('SUBMIT_MOBILE_BURST', '3'))
+app.config['INTAKE_MAX_PENDING'] = int(os.environ.get('INTAKE_MAX_PENDING', '200'))
+app.config['INTAKE_BATCH_SIZE'] = int(os.environ.get('INTAKE_BATCH_SIZE', '50'))
+app.config['INTAKE_WAIT_SECONDS'] = float(os.environ.get('INTAKE_WAIT_SECONDS', '5'))
+
+if app.config['CLUBS']:
+    app.wsgi_app = ClubMiddleware(app.wsgi_app, app.config['CLUBS'], app.config['CLUB_ROUTING'],
+                                  app.config['CLUB_DOMAIN'])
+
+# Snapshots taken by `flask backup` (see backups.py)
+app.config['BACKUP_DIR'] = os.environ.get('BACKUP_DIR', 'backups')
+
+# Behind a reverse proxy the client address is in X-Forwarded-For; set this
+# to the number of proxies in front of the app so rate limits see it (one on
+# Render, see render.yaml). Without it every visitor behind the proxy shares
+# the proxy's address, and so one per-IP submission limit.
+app.config['PROXY_FIX_X_FOR'] = int(os.environ.get('PROXY_FIX_X_FOR', '0'))
+if app.config['PROXY_FIX_X_FOR']:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'])
+
+# Nothing below touches the disk at import time. Data files are created
+# when a table is first used, and the default admin when initialize() runs:
+# once in the gunicorn master (see create_app() in main.py and
+# gunicorn.conf.py) or otherwise before the first request. Each club is
+# initialized on its first request.
+_initialized = set()
+_initialize_lock = threading.Lock()
+
 def initialize_data_files():
-    # Create users.json if it doesn't exist
-    if not os.path.exists('users.json'):
-        with open('users.json', 'w') as f:
-            json.dump([], f)
+    for table in TABLES:
+        ledger_cache.ensure(table)
     
-    # Create funds.json if it doesn't exist
-    if not os.path.exists('funds.json'):
-        with open('funds.json', 'w') as f:
-            json.dump([], f)
+    # Create a default admin user if no users exist. Several workers may
+    # start at once, so check again while holding the users lock.
+    if ledger_cache.read('users'):
+        return
     
-    # Create expenses.json if it doesn't exist
-    if not os.path.exists('expenses.json'):
-        with open('expenses.json', 'w') as f:
-            json.dump([], f)
+    # A club is reachable at /<club>/login as soon as it is listed in CLUBS,
+    # so it gets no well-known password: its first admin is created with
+    # `flask create-admin --club <club>`
+    club = current_club()
+    if club is not None:
+        logging.warning("Club %s has no users yet; create its admin with: flask create-admin --club %s", club, club)
+        return
     
-    # Create fund_submissions.json if it doesn't exist
-    if not os.path.exists('fund_submissions.json'):
-        with open('fund_submissions.json', 'w') as f:
-            json.dump([], f)
-    
-    # Create a default admin user if no users exist
-    with open('users.json', 'r') as f:
-        users = json.load(f)
+    with ledger_cache.locked('users'):
+        if not ledger_cache.read('users'):
+            admin_user = {
+                'id': 1,
+                'username': 'admin',
+                'password': generate_password_hash('admin123'),
+                'is_admin': True
+            }
+            ledger_cache.append('users', [admin_user])
+            logging.info("Created default admin user: username='admin', password='admin123'")
+
+def initialize():
+    club = current_club()
+    if club in _initialized:
+        return
     
-    if not users:
-        admin_user = {
-            'id': 1,
-            'username': 'admin',
-            'password': generate_password_hash('admin123'),
-            'is_admin': True
-        }
-        users.append(admin_user)
-        with open('users.json', 'w') as f:
-            json.dump(users, f, indent=4)
-        logging.info("Created default admin user: username='admin', password='admin123'")
-
-# Call the initialization function
-initialize_data_files()
-
-from models import User
+    with _initialize_lock:
+        if club not in _initialized:
+            started = time.perf_counter()
+            initialize_data_files()
+            converted = migrate_amounts()
+            if any(converted.values()):
+                logging.warning("Converted amounts from taka to poisha: %s", converted)
+            linked = link_members()
+            if linked:
+                logging.info("Linked %d fund entries to members", linked)
+            interrupted = Job.recover()
+            if interrupted:
+                logging.warning("Marked %d interrupted jobs as failed", interrupted)
+            _initialized.add(club)
+            logging.info("Data files%s ready in %.0f ms", f" of club {club}" if club else '',
+                         (time.perf_counter() - started) * 1000)
+
+@app.before_request
+def initialize_on_first_request():
+    initialize()
+
+from models import User, migrate_amounts, link_members
+from jobs import Job
 
 @login_manager.user_loader
 def load_user(user_id):
+    # User ids are per club: a session only counts for the club it logged in to
+    if session.get('club') != current_club():
+        return None
     return User.get_by_id(int(user_id))
\ No newline at end of file
@@ -0,0 +1,208 @@
+import gzip
+import hashlib
+import json
+import os
+import time
+from contextlib import ExitStack
+from datetime import datetime
+from storage import TABLES, ledger_cache, current_club
+
+# Online backups. A snapshot holds every table's rows as they were at one
+# moment: all the table locks are taken together, so no write (an approval
+# moving a submission into funds, say) is caught half done. Writers only
+# wait while the rows are read from the cache; hashing, compressing and
+# writing happen after the locks are released.
+#
+# Rows are cut into chunks by id range (CHUNK_ROWS ids each) and stored
+# gzipped under the SHA-256 of their content, so a chunk that didn't change
+# since the last snapshot is not stored again. Ledgers mostly grow at the
+# end, so a daily snapshot usually costs the last chunk of each table plus
+# the chunks holding changed rows (approved submissions, say).
+#
+#   <BACKUP_DIR>/chunks/ab/abcdef....gz             shared by all snapshots
+#   <BACKUP_DIR>/snapshots/<club>/<timestamp>.json  manifest: chunk hashes
+#                                                   per table, in order
+
+CHUNK_ROWS = 1000
+# Same order as the nested locks in models.py (submissions, then members,
+# then funds), so taking them all can't deadlock with a writer
+LOCK_ORDER = ('users', 'fund_submissions', 'members', 'funds', 'expenses')
+# Job rows describe work in this deployment's processes, not ledger data
+SKIPPED_TABLES = ('jobs',)
+TIMESTAMP_FORMAT = '%Y%m%dT%H%M%S%f'
+# Chunks this recent are never pruned: a snapshot being taken may be about
+# to refer to them
+PRUNE_GRACE_SECONDS = 3600
+
+def backup_tables():
+    tables = [table for table in TABLES if table not in SKIPPED_TABLES]
+    return sorted(tables, key=lambda table: LOCK_ORDER.index(table) if table in LOCK_ORDER else len(LOCK_ORDER))
+
+def _chunks(rows):
+    # Consecutive rows whose ids fall in the same range share a chunk
+    chunk = []
+    bucket = None
+    for row in rows:
+        if chunk and row['id'] // CHUNK_ROWS != bucket:
+            yield chunk
+            chunk = []
+        bucket = row['id'] // CHUNK_ROWS
+        chunk.append(row)
+    if chunk:
+        yield chunk
+
+def _encode(rows):
+    # One row per line with sorted keys, so equal rows give equal bytes
+    return ''.join(json.dumps(row, sort_keys=True, separators=(',', ':')) + '\n' for row in rows).encode('utf-8')
+
+def parse_timestamp(value):
+    # '2026-10-18' means the end of that day
+    moment = datetime.fromisoformat(value)
+    if len(value) <= 10:
+        moment = datetime.combine(moment.date(), datetime.max.time())
+    return moment
+
+class BackupStore:
+    def __init__(self, root='backups'):
+        self.root = root
+
+    def _chunk_path(self, digest):
+        return os.path.join(self.root, 'chunks', digest[:2], digest + '.gz')
+
+    def _snapshot_dir(self, club):
+        return os.path.join(self.root, 'snapshots', club or '_default')
+
+    def _store_chunk(self, data):
+        # Returns (hash, bytes written): 0 when the chunk was already stored
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._chunk_path(digest)
+        if os.path.exists(path):
+            # Reused: renew it so a concurrent prune leaves it alone
+            os.utime(path)
+            return digest, 0
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(gzip.compress(data, mtime=0))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        return digest, os.path.getsize(path)
+
+    def _load_chunk(self, digest):
+        with open(self._chunk_path(digest), 'rb') as f:
+            data = gzip.decompress(f.read())
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ValueError(f"Backup chunk {digest} is corrupt")
+        return [json.loads(line) for line in data.splitlines()]
+
+    def snapshot(self):
+        # Backs up the current club's tables; returns the manifest
+        tables = backup_tables()
+        with ExitStack() as stack:
+            for table in tables:
+                stack.enter_context(ledger_cache.locked(table))
+            created_at = datetime.now()
+            contents = {table: ledger_cache.read(table) for table in tables}
+
+        manifest = {
+            'id': created_at.strftime(TIMESTAMP_FORMAT),
+            'created_at': created_at.isoformat(timespec='microseconds'),
+            'club': current_club(),
+            'tables': {},
+            'bytes_written': 0,
+        }
+        for table, rows in contents.items():
+            hashes = []
+            for chunk in _chunks(rows):
+                digest, written = self._store_chunk(_encode(chunk))
+                hashes.append(digest)
+                manifest['bytes_written'] += written
+            manifest['tables'][table] = {'rows': len(rows), 'chunks': hashes}
+
+        directory = self._snapshot_dir(manifest['club'])
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, manifest['id'] + '.json')
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        return manifest
+
+    def list(self, club=None):
+        # The club's manifests, oldest first
+        directory = self._snapshot_dir(club)
+        if not os.path.isdir(directory):
+            return []
+        manifests = []
+        for name in sorted(os.listdir(directory)):
+            if name.endswith('.json'):
+                with open(os.path.join(directory, name)) as f:
+                    manifests.append(json.load(f))
+        return manifests
+
+    def find(self, club=None, at=None):
+        # The newest snapshot taken at or before `at` (a datetime; now if None)
+        candidates = self.list(club)
+        if at is not None:
+            candidates = [m for m in candidates if datetime.fromisoformat(m['created_at']) <= at]
+        return candidates[-1] if candidates else None
+
+    def load(self, manifest):
+        tables = {}
+        for table, stored in manifest['tables'].items():
+            rows = [row for digest in stored['chunks'] for row in self._load_chunk(digest)]
+            if len(rows) != stored['rows']:
+                raise ValueError(f"Snapshot {manifest['id']} has {len(rows)} {table} rows, expected {stored['rows']}")
+            tables[table] = rows
+        return tables
+
+    def restore(self, manifest):
+        # Replaces the current club's tables with the snapshot's, all under
+        # the table locks. Every chunk is read and checked before anything
+        # is written, and the state being replaced is snapshotted first so
+        # the restore can be undone. Tables the snapshot doesn't have are
+        # left alone. Returns (that snapshot, rows restored per table).
+        contents = self.load(manifest)
+        with ExitStack() as stack:
+            for table in backup_tables():
+                stack.enter_context(ledger_cache.locked(table))
+            previous = self.snapshot()
+            for table, rows in contents.items():
+                ledger_cache.write(table, rows)
+        return previous, {table: len(rows) for table, rows in contents.items()}
+
+    def prune(self, keep, clubs=(None,)):
+        # Keeps each club's newest `keep` snapshots, then deletes chunks no
+        # remaining snapshot uses. Returns (snapshots, chunks) deleted.
+        removed_snapshots = 0
+        for club in clubs:
+            manifests = self.list(club)
+            for manifest in manifests[:max(0, len(manifests) - keep)]:
+                os.remove(os.path.join(self._snapshot_dir(club), manifest['id'] + '.json'))
+                removed_snapshots += 1
+
+        # Every club's snapshots count, not just the ones pruned
+        snapshots_root = os.path.join(self.root, 'snapshots')
+        used = set()
+        if os.path.isdir(snapshots_root):
+            for directory in os.listdir(snapshots_root):
+                club = None if directory == '_default' else directory
+                for manifest in self.list(club):
+                    for stored in manifest['tables'].values():
+                        used.update(stored['chunks'])
+
+        removed_chunks = 0
+        cutoff = time.time() - PRUNE_GRACE_SECONDS
+        chunks_root = os.path.join(self.root, 'chunks')
+        if os.path.isdir(chunks_root):
+            for prefix in os.listdir(chunks_root):
+                for entry in os.scandir(os.path.join(chunks_root, prefix)):
+                    if (entry.name.endswith('.gz') and entry.name[:-3] not in used
+                            and entry.stat().st_mtime < cutoff):
+                        os.remove(entry.path)
+                        removed_chunks += 1
+        return removed_snapshots, removed_chunks
@@ -0,0 +1,95 @@
+import argparse
+import json
+import os
+import random
+from datetime import date, timedelta
+from werkzeug.security import generate_password_hash
+
+# Synthetic ledgers in the same shape and formatting as the real data files.
+# For a given size N: N funds, N/4 expenses, N/10 fund submissions (mostly
+# approved, a tail still pending), N/20 members and N/100 users, spread over
+# five years.
+
+FIRST_NAMES = ['Rahim', 'Karim', 'Fatema', 'Ayesha', 'Hasan', 'Nusrat', 'Tanvir', 'Sadia', 'Imran', 'Farhana']
+LAST_NAMES = ['Islam', 'Ahmed', 'Hossain', 'Rahman', 'Chowdhury', 'Khan', 'Akter', 'Uddin']
+EXPENSE_TITLES = ['Hall rent', 'Tea and snacks', 'Printing', 'Sports kit', 'Transport', 'Prize money', 'Banner']
+FUND_METHODS = ['bKash', 'Nagad', 'Cash', 'Other']
+SUBMISSION_METHODS = ['bKash', 'Nagad', 'Cellfin']
+
+def _date(rng, start, days):
+    return (start + timedelta(days=rng.randrange(days))).strftime('%Y-%m-%d')
+
+def generate(data_dir, size, seed=0, admin_password='admin123'):
+    rng = random.Random(seed)
+    start = date(2021, 1, 1)
+    days = 5 * 365
+    members = [{
+        'id': i,
+        'name': f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i}",
+        'mobile_number': f"017{rng.randrange(10 ** 8):08d}"
+    } for i in range(1, max(10, size // 20) + 1)]
+
+    funds = []
+    for i in range(1, size + 1):
+        member = rng.choice(members)
+        funds.append({
+            'id': i,
+            'name': member['name'],
+            'amount': rng.choice([20, 50, 100, 200, 500, 1000]) * 100,
+            'date': _date(rng, start, days),
+            'method': rng.choice(FUND_METHODS),
+            'member_id': member['id']
+        })
+
+    expenses = [{
+        'id': i,
+        'title': rng.choice(EXPENSE_TITLES),
+        'amount': rng.randrange(100, 20000) * 10,
+        'date': _date(rng, start, days),
+        'reason': 'Synthetic expense for benchmarking'
+    } for i in range(1, size // 4 + 1)]
+
+    submission_count = max(1, size // 10)
+    submissions = []
+    for i in range(1, submission_count + 1):
+        member = rng.choice(members)
+        submissions.append({
+            'id': i,
+            'full_name': member['name'],
+            'mobile_number': member['mobile_number'],
+            'amount': rng.choice([20, 50, 100, 200]) * 100,
+            'transaction_id': f"TX{seed}{i:09d}",
+            'payment_method': rng.choice(SUBMISSION_METHODS),
+            'screenshot': None,
+            'date_submitted': _date(rng, start, days),
+            # The most recent tenth is still waiting for approval
+            'status': 'pending' if i > submission_count * 0.9 else rng.choice(['approved'] * 9 + ['rejected'])
+        })
+
+    # One hash for everyone: hashing is deliberately slow
+    password_hash = generate_password_hash(admin_password)
+    users = [{'id': 1, 'username': 'admin', 'password': password_hash, 'is_admin': True}]
+    users += [{'id': i, 'username': f"member{i}", 'password': password_hash, 'is_admin': False}
+              for i in range(2, max(2, size // 100) + 1)]
+
+    os.makedirs(data_dir, exist_ok=True)
+    for filename, rows in (('users.json', users), ('funds.json', funds), ('expenses.json', expenses),
+                           ('fund_submissions.json', submissions), ('members.json', members)):
+        with open(os.path.join(data_dir, filename), 'w') as f:
+            json.dump(rows, f, indent=4)
+
+    return {'funds': len(funds), 'expenses': len(expenses), 'fund_submissions': len(submissions), 'users': len(users),
+            'members': len(members)}
+
+def main():
+    parser = argparse.ArgumentParser(description='Write a synthetic club ledger.')
+    parser.add_argument('data_dir')
+    parser.add_argument('--size', type=int, default=10000, help='Number of fund entries.')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    counts = generate(args.data_dir, args.size, args.seed)
+    print(', '.join(f"{table}: {count}" for table, count in counts.items()))
+
+if __name__ == '__main__':
+    main()
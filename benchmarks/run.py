@@ -0,0 +1,211 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.generate import generate
+
+# Drives the main pages through the Flask test client and the hot model
+# methods directly, against synthetic ledgers of increasing size.
+#
+#   python -m benchmarks.run --sizes 1000,10000,100000 --output results.json
+#   python -m benchmarks.run --compare results.json
+#
+# For each scenario it reports latency percentiles, throughput, peak Python
+# memory (tracemalloc, measured in a separate pass so it doesn't skew the
+# timings) and bytes written (from /proc/self/io where available).
+
+def _bytes_written():
+    try:
+        with open('/proc/self/io') as f:
+            for line in f:
+                if line.startswith('wchar:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def measure(name, operation, iterations, setup=None):
+    timings = []
+    errors = 0
+    written_before = _bytes_written()
+    started = time.perf_counter()
+
+    for i in range(iterations):
+        if setup:
+            setup()
+        t0 = time.perf_counter()
+        try:
+            operation(i)
+        except Exception as e:
+            errors += 1
+            if errors == 1:
+                print(f"  {name}: {type(e).__name__}: {e}", file=sys.stderr)
+        timings.append(time.perf_counter() - t0)
+
+    elapsed = time.perf_counter() - started
+    written_after = _bytes_written()
+
+    # Peak memory of one more call, traced separately
+    if setup:
+        setup()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        operation(iterations)
+    except Exception:
+        pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    timings.sort()
+    ms = [t * 1000 for t in timings]
+    return {
+        'scenario': name,
+        'iterations': iterations,
+        'errors': errors,
+        'p50_ms': _percentile(ms, 0.50),
+        'p90_ms': _percentile(ms, 0.90),
+        'p99_ms': _percentile(ms, 0.99),
+        'max_ms': ms[-1] if ms else None,
+        'ops_per_sec': iterations / sum(timings) if sum(timings) else None,
+        'wall_s': elapsed,
+        'peak_memory_kb': peak // 1024,
+        'bytes_written': (written_after - written_before) if written_before is not None else None,
+    }
+
+def run_size(size, args, app, client_factory):
+    from storage import ledger_cache, create_backend
+    from models import Fund, FundSubmission
+    import page_cache
+
+    data_dir = tempfile.mkdtemp(prefix=f"clubfund-bench-{size}-")
+    try:
+        counts = generate(data_dir, size, seed=args.seed)
+        os.chdir(data_dir)
+        ledger_cache.configure(create_backend(args.backend, os.path.join(data_dir, 'club_fund.db')))
+        if args.backend != 'json':
+            from storage import JsonBackend, TABLES
+            source = JsonBackend(data_dir)
+            for table in TABLES:
+                ledger_cache.write(table, source.load(table))
+        page_cache.pages.clear()
+        page_cache.fragments.clear()
+
+        client = client_factory()
+        client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+
+        def get(path):
+            def operation(i):
+                response = client.get(path)
+                if response.status_code != 200:
+                    raise RuntimeError(f"GET {path} returned {response.status_code}")
+            return operation
+
+        def cold():
+            # Forget every parsed ledger and rendered page
+            ledger_cache.invalidate()
+            page_cache.pages.clear()
+
+        pending = [s['id'] for s in FundSubmission.get_pending_submissions()]
+
+        def approve(i):
+            if i < len(pending):
+                FundSubmission.approve_submission(pending[i])
+
+        results = []
+        for path in ('/', '/dashboard', '/summary'):
+            results.append(measure(f"GET {path} (cold)", get(path), args.read_iterations, setup=cold))
+            results.append(measure(f"GET {path} (warm)", get(path), args.read_iterations))
+        results.append(measure('Fund.add_entry', lambda i: Fund.add_entry('Bench', 100, '2025-01-01', 'Cash'),
+                               args.write_iterations))
+        # One pending submission is kept back for the memory pass
+        approvals = max(1, min(args.write_iterations, len(pending) - 1))
+        results.append(measure('FundSubmission.approve_submission', approve, approvals))
+
+        for result in results:
+            result['size'] = size
+            result['rows'] = counts
+        return results
+    finally:
+        os.chdir(ROOT)
+        if not args.keep:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+def print_table(results, previous=None):
+    baseline = {(r['size'], r['scenario']): r for r in (previous or {}).get('results', [])}
+    print(f"{'size':>8}  {'scenario':<36} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'ops/s':>9} "
+          f"{'peak KB':>9} {'written':>11}" + ('  p50 vs base' if previous else ''))
+    for r in results:
+        line = (f"{r['size']:>8}  {r['scenario']:<36} {r['p50_ms']:>9.2f} {r['p90_ms']:>9.2f} {r['p99_ms']:>9.2f} "
+                f"{r['ops_per_sec'] or 0:>9.1f} {r['peak_memory_kb']:>9} {r['bytes_written'] or 0:>11}")
+        base = baseline.get((r['size'], r['scenario']))
+        if base and base.get('p50_ms'):
+            line += f"  {r['p50_ms'] / base['p50_ms']:>6.2f}x"
+        if r['errors']:
+            line += f"  ({r['errors']} errors)"
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the club fund tracker against synthetic ledgers.')
+    parser.add_argument('--sizes', default='1000,10000', help='Comma-separated fund counts, e.g. 1000,10000,100000,1000000.')
+    parser.add_argument('--backend', default='json', choices=['json', 'journal', 'sqlite'])
+    parser.add_argument('--read-iterations', type=int, default=30)
+    parser.add_argument('--write-iterations', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write the results as JSON to this file.')
+    parser.add_argument('--compare', help='Earlier results file to compare p50 latencies against.')
+    parser.add_argument('--keep', action='store_true', help='Keep the generated data directories.')
+    args = parser.parse_args()
+
+    # Import the app inside a scratch directory so its startup doesn't
+    # touch the real data files
+    scratch = tempfile.mkdtemp(prefix='clubfund-bench-')
+    os.chdir(scratch)
+    os.environ['STORAGE_BACKEND'] = 'json'
+    import main as application
+    app = application.app
+    app.config['WTF_CSRF_ENABLED'] = False
+    os.chdir(ROOT)
+
+    results = []
+    for size in [int(s) for s in args.sizes.split(',') if s.strip()]:
+        print(f"size {size}...", file=sys.stderr)
+        results.extend(run_size(size, args, app, app.test_client))
+    shutil.rmtree(scratch, ignore_errors=True)
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+    print_table(results, previous)
+
+    if args.output:
+        report = {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'backend': args.backend,
+            'results': results,
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=4)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.generate import generate
+
+# Cold-start budget check: each run is a fresh interpreter that imports the
+# app, runs create_app() (what the gunicorn master does) and serves a first
+# request, timing each step.
+#
+#   python -m benchmarks.startup --sizes 0,10000 --budget 3
+#
+# Exits with status 1 when the median time to the first response is over
+# the budget.
+
+CHILD = """
+import json, sys, time
+started = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+import main
+imported = time.perf_counter()
+app = main.create_app()
+created = time.perf_counter()
+response = app.test_client().get('/api/v1/summary')
+served = time.perf_counter()
+print(json.dumps({
+    'import_s': imported - started,
+    'create_app_s': created - imported,
+    'first_request_s': served - created,
+    'total_s': served - started,
+    'status': response.status_code,
+}))
+"""
+
+def run_once(data_dir):
+    env = dict(os.environ, STORAGE_BACKEND='json', LOG_LEVEL='WARNING')
+    output = subprocess.run([sys.executable, '-c', CHILD, ROOT], cwd=data_dir, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure cold start time against a budget.')
+    parser.add_argument('--sizes', default='0,10000', help='Comma-separated fund counts (0 for empty data files).')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=float(os.environ.get('STARTUP_BUDGET_SECONDS', '3')),
+                        help='Seconds allowed from interpreter start to the first response.')
+    args = parser.parse_args()
+
+    over_budget = False
+    print(f"{'size':>8}  {'import s':>9} {'create s':>9} {'first s':>9} {'total s':>9}")
+    for size in [int(s) for s in args.sizes.split(',') if s.strip()]:
+        data_dir = tempfile.mkdtemp(prefix=f"clubfund-startup-{size}-")
+        try:
+            if size:
+                generate(data_dir, size)
+            runs = [run_once(data_dir) for _ in range(args.runs)]
+        finally:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+        median = {key: sorted(run[key] for run in runs)[len(runs) // 2]
+                  for key in ('import_s', 'create_app_s', 'first_request_s', 'total_s')}
+        line = (f"{size:>8}  {median['import_s']:>9.3f} {median['create_app_s']:>9.3f} "
+                f"{median['first_request_s']:>9.3f} {median['total_s']:>9.3f}")
+        if median['total_s'] > args.budget:
+            over_budget = True
+            line += f"  over the {args.budget:.2f}s budget"
+        print(line)
+
+    sys.exit(1 if over_budget else 0)
+
+if __name__ == '__main__':
+    main()
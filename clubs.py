@@ -0,0 +1,102 @@
+import re
+from werkzeug.exceptions import NotFound
+from storage import ledger_cache
+
+# Serving several clubs from one deployment. Each club has its own ledgers
+# (see ClubLedgerCache in storage.py); ClubMiddleware works out which club a
+# request is for before Flask sees it:
+#
+#   path       example.org/dhaka/funds: the club becomes part of SCRIPT_NAME,
+#              so routes and url_for() work unchanged under the prefix
+#   subdomain  dhaka.example.org/funds, with CLUB_DOMAIN=example.org
+#
+# Requests for no club (example.org/ itself) use the default ledgers: the
+# federation's own users, who see the rollup of every club.
+
+CLUB_NAME = re.compile(r'^[a-z0-9][a-z0-9-]{0,31}$')
+# First path segments the app itself uses: with path routing a club with one
+# of these names would hide the federation's own pages
+RESERVED = frozenset({
+    'api', 'static', 'login', 'logout', 'register', 'metrics', 'dashboard', 'funds', 'expenses', 'summary',
+    'submit_fund', 'export', 'import', 'jobs', 'approve_submission', 'reject_submission', 'moderate_submissions',
+})
+
+def parse_clubs(value):
+    names = [name.strip().lower() for name in (value or '').split(',') if name.strip()]
+    invalid = [name for name in names if not CLUB_NAME.match(name)]
+    if invalid:
+        raise ValueError(f"Invalid club names: {', '.join(invalid)}")
+    reserved = [name for name in names if name in RESERVED]
+    if reserved:
+        raise ValueError(f"Reserved club names: {', '.join(reserved)}")
+    return names
+
+def check_routes(clubs, url_map):
+    # Catches routes added after RESERVED was last updated
+    used = {rule.rule.lstrip('/').split('/')[0] for rule in url_map.iter_rules()}
+    clashing = sorted(set(clubs) & used)
+    if clashing:
+        raise ValueError(f"Club names clash with routes: {', '.join(clashing)}")
+
+def schema_name(club):
+    return 'club_' + club.replace('-', '_')
+
+class ClubResponse:
+    # The response body is often generated lazily (CSV exports), after the
+    # app call has returned, so the club is made current again around every
+    # chunk and around close()
+
+    def __init__(self, club, response):
+        self.club = club
+        self.response = response
+        self._iterator = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        with ledger_cache.using(self.club):
+            if self._iterator is None:
+                self._iterator = iter(self.response)
+            return next(self._iterator)
+
+    def close(self):
+        if hasattr(self.response, 'close'):
+            with ledger_cache.using(self.club):
+                self.response.close()
+
+class ClubMiddleware:
+    def __init__(self, app, clubs, routing='path', domain=None):
+        if routing not in ('path', 'subdomain'):
+            raise ValueError(f"Unknown club routing: {routing}")
+        self.app = app
+        self.clubs = set(clubs)
+        self.routing = routing
+        self.domain = (domain or '').lower().lstrip('.')
+
+    def resolve(self, environ):
+        # The club's name, None for the federation itself, or False for a
+        # club that doesn't exist
+        if self.routing == 'subdomain':
+            host = environ.get('HTTP_HOST', '').split(':')[0].lower()
+            if not self.domain or not host.endswith('.' + self.domain):
+                return None
+            name = host[:-len(self.domain) - 1]
+            return name if name in self.clubs else False
+
+        first, _, rest = environ.get('PATH_INFO', '').lstrip('/').partition('/')
+        if first not in self.clubs:
+            return None
+        environ['SCRIPT_NAME'] = environ.get('SCRIPT_NAME', '').rstrip('/') + '/' + first
+        environ['PATH_INFO'] = '/' + rest
+        return first
+
+    def __call__(self, environ, start_response):
+        club = self.resolve(environ)
+        if club is False:
+            return NotFound('No such club.')(environ, start_response)
+
+        environ['clubfund.club'] = club
+        with ledger_cache.using(club):
+            response = self.app(environ, start_response)
+        return ClubResponse(club, response)
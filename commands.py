@@ -0,0 +1,254 @@
+import os
+from functools import wraps
+import click
+from app import app, initialize
+from models import User, Fund, Expense, FundSubmission, Member, Federation, migrate_amounts, link_members, FUNDS_TABLE, EXPENSES_TABLE, SUBMISSIONS_TABLE
+from money import format_taka
+from storage import TABLES, JsonBackend, ledger_cache, current_club
+from aggregates import LedgerAggregate
+from indexes import transaction_key, mobile_key
+from backups import BackupStore, parse_timestamp
+from importer import import_entries
+
+def club_option(command):
+    # --club (or CLUB=) runs the command against one club's ledgers
+    @click.option('--club', envvar='CLUB', default=None, help='Club to work on (with CLUBS set).')
+    @wraps(command)
+    def wrapper(club, **kwargs):
+        if club is not None and club not in ledger_cache.clubs:
+            raise click.BadParameter(f"unknown club {club!r}", param_hint='--club')
+        with ledger_cache.using(club):
+            return command(**kwargs)
+    return wrapper
+
+def column_totals(columns):
+    # The same figures as a LedgerAggregate, taken from the columnar view:
+    # a separate structure and code path (array slices, months found by
+    # bisecting parsed dates) to check the aggregate against
+    totals = LedgerAggregate()
+    totals.count = len(columns)
+    totals.total = columns.total()
+    totals.by_month = columns.by_month()
+    return totals
+
+@app.cli.command('rebuild-aggregates')
+@club_option
+def rebuild_aggregates():
+    """Recompute ledger totals from scratch and check them against the maintained and columnar ones."""
+    consistent = True
+    
+    for label, model in (('funds', Fund), ('expenses', Expense)):
+        maintained, rebuilt = model.rebuild_aggregate()
+        problems = column_totals(model.get_columns()).differences(rebuilt)
+        if maintained is not None:
+            problems += maintained.differences(rebuilt)
+        else:
+            click.echo(f"{label}: nothing maintained in this process, checked against the columnar view "
+                       f"(run the rebuild-aggregates job to check the running app)")
+        
+        if problems:
+            consistent = False
+            click.echo(f"{label}: rebuilt, {len(problems)} difference(s) found")
+            for problem in problems:
+                click.echo(f"  {problem}")
+        else:
+            click.echo(f"{label}: {rebuilt.count} entries, total {format_taka(rebuilt.total)}, {len(rebuilt.by_month)} months")
+    
+    if not consistent:
+        raise SystemExit(1)
+
+@app.cli.command('create-admin')
+@club_option
+@click.option('--username', default='admin', show_default=True, help='Username of the new admin.')
+@click.password_option(help='Password of the new admin (prompted for if not given).')
+def create_admin(username, password):
+    """Create an admin user, e.g. the first one of a club."""
+    if not User.register(username, password, is_admin=True):
+        raise click.ClickException(f"user {username!r} already exists")
+    club = current_club()
+    click.echo(f"Created admin {username!r}" + (f" for club {club}" if club else ''))
+
+@app.cli.command('import-json')
+@club_option
+@click.option('--data-dir', default='.', help='Directory containing the JSON ledger files.')
+@click.option('--force', is_flag=True, help='Replace tables that already have rows.')
+def import_json(data_dir, force):
+    """Copy the JSON ledger files into the configured storage backend."""
+    source = JsonBackend(data_dir)
+    
+    for table in TABLES:
+        if not os.path.exists(source.path(table)):
+            click.echo(f"{table}: no {source.path(table)}, skipped")
+            continue
+        
+        if ledger_cache.read(table) and not force:
+            click.echo(f"{table}: already has rows, skipped (use --force to replace)")
+            continue
+        
+        rows = source.load(table)
+        ledger_cache.write(table, rows)
+        click.echo(f"{table}: imported {len(rows)} rows")
+    
+    # Files from before amounts were kept in poisha
+    for table, count in migrate_amounts().items():
+        if count:
+            click.echo(f"{table}: converted {count} amounts to poisha")
+
+@app.cli.command('link-members')
+@club_option
+def link_members_command():
+    """Give fund entries without a member one, creating members as needed."""
+    linked = link_members()
+    click.echo(f"linked {linked} fund entries, {len(Member.get_all())} members")
+
+@app.cli.command('migrate-amounts')
+@club_option
+def migrate_amounts_command():
+    """Convert amounts stored as float taka to integer poisha."""
+    for table, count in migrate_amounts().items():
+        click.echo(f"{table}: converted {count} amounts")
+
+@app.cli.command('compact-storage')
+@club_option
+def compact_storage():
+    """Rewrite every table in one piece (folds the journal into its snapshot)."""
+    for table in TABLES:
+        with ledger_cache.locked(table):
+            rows = ledger_cache.read(table)
+            ledger_cache.write(table, rows)
+        click.echo(f"{table}: {len(rows)} rows")
+
+@app.cli.command('import-entries')
+@club_option
+@click.argument('kind', type=click.Choice(['funds', 'expenses']))
+@click.argument('source', type=click.File('rb'))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), default=None,
+              help='Defaults to the file extension.')
+@click.option('--dry-run', is_flag=True, help='Validate only, store nothing.')
+def import_entries_command(kind, source, fmt, dry_run):
+    """Bulk-import funds or expenses from a CSV or JSON Lines file."""
+    if fmt is None:
+        fmt = 'jsonl' if source.name.endswith('.jsonl') else 'csv'
+    
+    result = import_entries(kind, source, fmt, dry_run=dry_run)
+    
+    for error in result['errors']:
+        click.echo(error, err=True)
+    click.echo(f"{result['valid']} valid, {result['added']} added, "
+               f"{result['duplicates']} duplicates skipped, {len(result['errors'])} invalid")
+
+def submission_groups(submissions):
+    # Submission ids per transaction and per mobile number, grouped straight
+    # from the rows, to check the index against
+    by_transaction = {}
+    by_mobile = {}
+    for submission in submissions:
+        key = transaction_key(submission['payment_method'], submission['transaction_id'])
+        by_transaction.setdefault(key, set()).add(submission['id'])
+        by_mobile.setdefault(mobile_key(submission['mobile_number']), set()).add(submission['id'])
+    return by_transaction, by_mobile
+
+def index_differences(index, by_transaction, by_mobile):
+    problems = []
+    for name, indexed, expected in (('transaction id', index.by_transaction, by_transaction),
+                                    ('mobile number', index.by_mobile, by_mobile)):
+        for key in sorted(set(indexed) | set(expected), key=repr):
+            if set(indexed.get(key, ())) != expected.get(key, set()):
+                problems.append(f"{name} {key}: index has {sorted(indexed.get(key, ()))}, "
+                                f"submissions have {sorted(expected.get(key, ()))}")
+    return problems
+
+@app.cli.command('rebuild-submission-index')
+@club_option
+def rebuild_submission_index():
+    """Rebuild the transaction id / mobile number index of fund submissions and check it against the submissions."""
+    maintained, rebuilt = FundSubmission.rebuild_index()
+    by_transaction, by_mobile = submission_groups(ledger_cache.read(SUBMISSIONS_TABLE))
+    
+    problems = index_differences(rebuilt, by_transaction, by_mobile)
+    if maintained is not None:
+        problems += index_differences(maintained, by_transaction, by_mobile)
+    else:
+        click.echo("nothing maintained in this process, only the rebuilt index was checked")
+    
+    duplicated = sum(1 for ids in by_transaction.values() if len(ids) > 1)
+    click.echo(f"{len(by_transaction)} transaction ids ({duplicated} used more than once), "
+               f"{len(by_mobile)} mobile numbers")
+    
+    if problems:
+        click.echo(f"{len(problems)} difference(s) found")
+        for problem in problems:
+            click.echo(f"  {problem}")
+        raise SystemExit(1)
+
+@app.cli.command('federation-summary')
+def federation_summary():
+    """Show every club's totals and the federation-wide sum."""
+    if not ledger_cache.clubs:
+        click.echo("No clubs configured (set CLUBS)")
+        return
+    
+    for club in ledger_cache.clubs:
+        with ledger_cache.using(club):
+            initialize()
+    
+    summary = Federation.get_summary()
+    for club in summary['clubs']:
+        click.echo(f"{club['club']}: funds {format_taka(club['total_funds'])}, "
+                   f"expenses {format_taka(club['total_expenses'])}, balance {format_taka(club['balance'])}")
+    click.echo(f"all clubs: funds {format_taka(summary['total_funds'])}, "
+               f"expenses {format_taka(summary['total_expenses'])}, balance {format_taka(summary['balance'])}")
+
+@app.cli.command('backup')
+@club_option
+@click.option('--all-clubs', is_flag=True, help='Back up the federation and every club.')
+@click.option('--keep', type=int, default=None, help='Then keep only the newest N snapshots.')
+def backup(all_clubs, keep):
+    """Take a consistent snapshot of every ledger while the app keeps running."""
+    store = BackupStore(app.config['BACKUP_DIR'])
+    clubs = (None,) + ledger_cache.clubs if all_clubs else (current_club(),)
+    
+    for club in clubs:
+        with ledger_cache.using(club):
+            manifest = store.snapshot()
+        rows = sum(table['rows'] for table in manifest['tables'].values())
+        click.echo(f"{club or 'default'}: snapshot {manifest['id']}, {rows} rows, "
+                   f"{manifest['bytes_written']} new bytes stored")
+    
+    if keep:
+        snapshots, chunks = store.prune(keep, clubs)
+        click.echo(f"pruned {snapshots} snapshots and {chunks} unused chunks")
+
+@app.cli.command('backups')
+@club_option
+def list_backups():
+    """List the snapshots that can be restored."""
+    for manifest in BackupStore(app.config['BACKUP_DIR']).list(current_club()):
+        counts = ', '.join(f"{table} {stored['rows']}" for table, stored in manifest['tables'].items())
+        click.echo(f"{manifest['id']}  {manifest['created_at']}  {counts}")
+
+@app.cli.command('restore')
+@club_option
+@click.argument('at')
+@click.option('--yes', is_flag=True, help='Do not ask for confirmation.')
+def restore(at, yes):
+    """Restore the ledgers to a snapshot id, or the last snapshot at or before a date/time."""
+    store = BackupStore(app.config['BACKUP_DIR'])
+    manifest = next((m for m in store.list(current_club()) if m['id'] == at), None)
+    if manifest is None:
+        try:
+            manifest = store.find(current_club(), parse_timestamp(at))
+        except ValueError:
+            raise click.BadParameter('expected a snapshot id or an ISO date/time', param_hint='AT')
+    if manifest is None:
+        click.echo(f"No snapshot at or before {at}")
+        raise SystemExit(1)
+    
+    click.echo(f"Snapshot {manifest['id']} from {manifest['created_at']}")
+    if not yes:
+        click.confirm('Replace the current ledgers with it?', abort=True)
+    
+    previous, counts = store.restore(manifest)
+    click.echo(f"previous ledgers saved as snapshot {previous['id']}")
+    for table, count in counts.items():
+        click.echo(f"{table}: {count} rows")
@@ -0,0 +1,64 @@
+import csv
+import heapq
+import io
+import zlib
+from money import format_amount
+
+# CSV exports are produced as a stream of byte chunks so a response can
+# start sending before the whole ledger has been formatted and never holds
+# more than one chunk of CSV text.
+
+CHUNK_SIZE = 64 * 1024
+
+FUND_COLUMNS = (('ID', 'id'), ('Name', 'name'), ('Amount', 'amount'), ('Date', 'date'), ('Method', 'method'))
+EXPENSE_COLUMNS = (('ID', 'id'), ('Title', 'title'), ('Amount', 'amount'), ('Date', 'date'), ('Reason', 'reason'))
+SUBMISSION_COLUMNS = (
+    ('ID', 'id'), ('Full Name', 'full_name'), ('Mobile Number', 'mobile_number'), ('Amount', 'amount'),
+    ('Transaction ID', 'transaction_id'), ('Payment Method', 'payment_method'), ('Screenshot', 'screenshot'),
+    ('Date Submitted', 'date_submitted'), ('Status', 'status')
+)
+MEMBER_COLUMNS = (('ID', 'id'), ('Name', 'name'), ('Mobile Number', 'mobile_number'), ('Total', 'total'))
+LEDGER_COLUMNS = (
+    ('Date', 'date'), ('Type', 'type'), ('ID', 'id'), ('Description', 'description'),
+    ('Details', 'details'), ('Amount', 'amount')
+)
+
+# Amounts are stored in poisha and exported as taka ('1234.50'), which is
+# also what the importer reads back
+FORMATTERS = {'amount': format_amount, 'total': format_amount}
+
+def _cell(row, field):
+    value = row.get(field)
+    if value is not None and field in FORMATTERS:
+        return FORMATTERS[field](value)
+    return value
+
+def csv_chunks(columns, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([header for header, _ in columns])
+
+    for row in rows:
+        writer.writerow([_cell(row, field) for _, field in columns])
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue().encode('utf-8')
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # 31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def ledger_rows(funds, expenses):
+    # Merge two newest-first streams into one newest-first ledger
+    fund_rows = ({'date': f['date'], 'type': 'Fund', 'id': f['id'], 'description': f['name'],
+                  'details': f['method'], 'amount': f['amount']} for f in funds)
+    expense_rows = ({'date': e['date'], 'type': 'Expense', 'id': e['id'], 'description': e['title'],
+                     'details': e['reason'], 'amount': -e['amount']} for e in expenses)
+    return heapq.merge(fund_rows, expense_rows, key=lambda row: row['date'], reverse=True)
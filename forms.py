@@ -1,7 +1,7 @@
 from flask_wtf import FlaskForm
-from flask_wtf.file import FileField, FileAllowed
-from wtforms import StringField, PasswordField, SubmitField, FloatField, DateField, SelectField, TextAreaField
-from wtforms.validators import DataRequired, Length, EqualTo
+from flask_wtf.file import FileField, FileAllowed, FileRequired
+from wtforms import StringField, PasswordField, SubmitField, DecimalField, DateField, SelectField, TextAreaField, BooleanField
+from wtforms.validators import DataRequired, Length, EqualTo, Optional, Regexp
 
 class RegisterForm(FlaskForm):
     username = StringField('Username', validators=[DataRequired(), Length(min=3, max=20)])
@@ -16,7 +16,7 @@ class LoginForm(FlaskForm):
 
 class FundForm(FlaskForm):
     name = StringField('Member Name', validators=[DataRequired()])
-    amount = FloatField('Amount', validators=[DataRequired()])
+    amount = DecimalField('Amount', places=2, validators=[DataRequired()])
     date = DateField('Date', validators=[DataRequired()])
     method = SelectField('Payment Method', 
                         choices=[('bKash', 'bKash'), ('Nagad', 'Nagad'), ('Cash', 'Cash'), ('Other', 'Other')],
@@ -25,7 +25,7 @@ class FundForm(FlaskForm):
 
 class ExpenseForm(FlaskForm):
     title = StringField('Expense Title', validators=[DataRequired()])
-    amount = FloatField('Amount', validators=[DataRequired()])
+    amount = DecimalField('Amount', places=2, validators=[DataRequired()])
     date = DateField('Date', validators=[DataRequired()])
     reason = TextAreaField('Reason', validators=[DataRequired()])
     submit = SubmitField('Add Expense')
@@ -33,10 +33,35 @@ class ExpenseForm(FlaskForm):
 class FundSubmissionForm(FlaskForm):
     full_name = StringField('Full Name', validators=[DataRequired(), Length(min=3, max=50)])
     mobile_number = StringField('Mobile Number', validators=[DataRequired(), Length(min=11, max=15)])
-    amount = FloatField('Amount', validators=[DataRequired()])
+    amount = DecimalField('Amount', places=2, validators=[DataRequired()])
     transaction_id = StringField('Transaction ID', validators=[DataRequired()])
     payment_method = SelectField('Payment Method', 
                         choices=[('bKash', 'bKash'), ('Nagad', 'Nagad'), ('Cellfin', 'Cellfin')],
                         validators=[DataRequired()])
     screenshot = FileField('Screenshot (Optional)', validators=[FileAllowed(['jpg', 'png', 'jpeg'])])
     submit = SubmitField('Submit Fund')
+
+class ImportForm(FlaskForm):
+    file = FileField('CSV or JSON Lines file', validators=[FileRequired(), FileAllowed(['csv', 'jsonl'])])
+    submit = SubmitField('Import')
+
+class ModerationForm(FlaskForm):
+    # The submission ids come from checkboxes named submission_ids
+    action = SelectField('Action', choices=[('approve', 'Approve'), ('reject', 'Reject')], validators=[DataRequired()])
+    submit = SubmitField('Apply to selected')
+
+class JobForm(FlaskForm):
+    task = SelectField('Job',
+                        choices=[('export', 'Export CSV'), ('yearly-report', 'Yearly report'),
+                                 ('rebuild-aggregates', 'Rebuild aggregates'), ('compact-storage', 'Compact storage'),
+                                 ('cleanup-uploads', 'Clean up uploads')],
+                        validators=[DataRequired()])
+    target = SelectField('Export',
+                        choices=[('ledger', 'Ledger'), ('funds', 'Funds'), ('expenses', 'Expenses'),
+                                 ('submissions', 'Fund submissions'), ('members', 'Members')],
+                        default='ledger')
+    start = DateField('From', validators=[Optional()])
+    end = DateField('To', validators=[Optional()])
+    year = StringField('Year', validators=[Optional(), Regexp(r'^\d{4}$')])
+    gzip = BooleanField('Compress (.gz)')
+    submit = SubmitField('Start')
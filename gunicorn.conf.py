@@ -0,0 +1,17 @@
+import os
+
+# Read automatically by `gunicorn 'main:create_app()'`
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', '2'))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '60'))
+loglevel = os.environ.get('LOG_LEVEL', 'info').lower()
+accesslog = '-'
+
+# Import the app and load the ledgers once in the master; workers are
+# forked with all of it already in memory instead of each repeating it
+preload_app = True
+
+def post_fork(server, worker):
+    from storage import ledger_cache
+    ledger_cache.after_fork()
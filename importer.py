@@ -0,0 +1,81 @@
+import csv
+import io
+import json
+from werkzeug.datastructures import MultiDict
+from forms import FundForm, ExpenseForm
+from models import Fund, Expense
+from exports import FUND_COLUMNS, EXPENSE_COLUMNS
+
+# Bulk import of funds or expenses from CSV (headers as in the exports or
+# the field names) or JSON Lines. Every row is checked with the same form
+# the single-entry pages use, and the valid rows are stored in one write.
+
+KINDS = {
+    'funds': (Fund, FundForm, FUND_COLUMNS),
+    'expenses': (Expense, ExpenseForm, EXPENSE_COLUMNS),
+}
+
+class InvalidRow:
+    # Stands in for a row that couldn't be parsed, so validate() reports it
+    # with the other row errors instead of the whole import failing
+    def __init__(self, problem):
+        self.problem = problem
+
+def read_rows(stream, fmt):
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig') if isinstance(stream.read(0), bytes) else stream
+
+    if fmt == 'jsonl':
+        for line in text:
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    yield InvalidRow('invalid JSON')
+    elif fmt == 'csv':
+        yield from csv.DictReader(text)
+    else:
+        raise ValueError(f"Unknown import format: {fmt}")
+
+def validate(kind, rows):
+    model, form_class, columns = KINDS[kind]
+    # Accept either export headers ("Name") or field names ("name")
+    field_names = {label.lower(): field for label, field in columns}
+    field_names.update({field: field for _, field in columns})
+
+    entries = []
+    errors = []
+    for line, row in enumerate(rows, start=1):
+        if isinstance(row, InvalidRow):
+            errors.append(f"row {line}: {row.problem}")
+            continue
+        # A JSON Lines row can be valid JSON without being an object
+        if not isinstance(row, dict):
+            errors.append(f"row {line}: expected an object with the entry's fields")
+            continue
+
+        data = MultiDict()
+        for key, value in row.items():
+            field = field_names.get(str(key).strip().lower())
+            if field and field != 'id' and value is not None:
+                data[field] = str(value).strip()
+
+        form = form_class(formdata=data, meta={'csrf': False})
+        if not form.validate():
+            problems = '; '.join(f"{name}: {', '.join(messages)}" for name, messages in form.errors.items())
+            errors.append(f"row {line}: {problems}")
+            continue
+
+        entry = {field: getattr(form, field).data for field in model.FIELDS}
+        entry['date'] = entry['date'].strftime('%Y-%m-%d')
+        entries.append(entry)
+
+    return entries, errors
+
+def import_entries(kind, stream, fmt='csv', dry_run=False):
+    entries, errors = validate(kind, read_rows(stream, fmt))
+
+    added = duplicates = 0
+    if entries and not dry_run:
+        added, duplicates = KINDS[kind][0].add_entries(entries)
+
+    return {'valid': len(entries), 'added': added, 'duplicates': duplicates, 'errors': errors}
@@ -0,0 +1,271 @@
+import bisect
+
+# A ledger kept sorted by (date, -id). Walking it backwards gives the
+# newest-first order the pages show (ties in insertion order, like
+# get_all), and a date range is two bisects, so fetching a page costs
+# O(log N + page size) instead of a sort of the whole ledger.
+
+class Page:
+    def __init__(self, items, page, per_page, total, next_cursor=None):
+        self.items = items
+        self.page = page
+        self.per_page = per_page
+        self.total = total
+        self.next_cursor = next_cursor
+
+    @property
+    def pages(self):
+        return max(1, -(-self.total // self.per_page))
+
+    @property
+    def has_prev(self):
+        return self.page > 1
+
+    @property
+    def has_next(self):
+        return self.page < self.pages
+
+def parse_cursor(cursor):
+    # Cursors look like '2025-05-13:42' (date and id of the last row seen)
+    try:
+        date, row_id = cursor.rsplit(':', 1)
+        return (date, -int(row_id))
+    except (AttributeError, ValueError):
+        return None
+
+class DateIndex:
+    def __init__(self, date_field, rows=()):
+        self.date_field = date_field
+        self.rows = sorted(rows, key=self._key)
+        self.keys = [self._key(row) for row in self.rows]
+        self.key_of = {row['id']: key for row, key in zip(self.rows, self.keys)}
+
+    def _key(self, row):
+        return (row[self.date_field], -row['id'])
+
+    @classmethod
+    def view(cls, date_field, field=None, value=None):
+        # build/apply/on_update for LedgerCache.view(), optionally limited to
+        # rows where row[field] == value. A changed row is taken out and put
+        # back if it still matches, so approving a submission moves it from
+        # the pending view to the approved one without a rebuild.
+        def matching(rows):
+            if field is None:
+                return rows
+            return [row for row in rows if row.get(field) == value]
+
+        def build(rows):
+            return cls(date_field, matching(rows))
+
+        def apply(index, new_rows):
+            index.add(matching(new_rows))
+            return index
+
+        def on_update(index, changed_rows):
+            for row in changed_rows:
+                index.discard(row)
+            index.add(matching(changed_rows))
+            return index
+
+        return build, apply, on_update
+
+    def add(self, rows):
+        # New entries are usually the most recent, so this is mostly an
+        # append at the end
+        for row in rows:
+            key = self._key(row)
+            position = bisect.bisect_right(self.keys, key)
+            self.keys.insert(position, key)
+            self.rows.insert(position, row)
+            self.key_of[row['id']] = key
+
+    def discard(self, row):
+        # By the key it was added under, in case the change moved its date
+        key = self.key_of.pop(row['id'], None)
+        if key is None:
+            return
+        position = bisect.bisect_left(self.keys, key)
+        del self.keys[position]
+        del self.rows[position]
+
+    def bounds(self, start=None, end=None, before=None):
+        lo = 0 if start is None else bisect.bisect_left(self.keys, (start, float('-inf')))
+        hi = len(self.keys) if end is None else bisect.bisect_right(self.keys, (end, float('inf')))
+        if before is not None:
+            hi = min(hi, bisect.bisect_left(self.keys, before))
+        return lo, max(lo, hi)
+
+    def iter_newest(self, start=None, end=None):
+        # Copies only the row references for the range, so entries added
+        # while a caller is still iterating don't shift what it sees
+        lo, hi = self.bounds(start, end)
+        return reversed(self.rows[lo:hi])
+
+    def newest(self, lo, hi, offset, limit):
+        stop = max(lo, hi - offset)
+        first = max(lo, stop - limit)
+        return self.rows[first:stop][::-1]
+
+    def page(self, page=1, per_page=50, start=None, end=None, cursor=None):
+        before = parse_cursor(cursor) if cursor else None
+        lo, hi = self.bounds(start, end, before)
+        total = hi - lo
+
+        page = max(1, page)
+        if before is not None:
+            # A cursor replaces the page number: the page starts right after it
+            page = 1
+
+        offset = (page - 1) * per_page
+        items = self.newest(lo, hi, offset, per_page)
+
+        next_cursor = None
+        if items and offset + len(items) < total:
+            last = items[-1]
+            next_cursor = f"{last[self.date_field]}:{last['id']}"
+
+        return Page(items, page, per_page, total, next_cursor)
+
+def transaction_key(payment_method, transaction_id):
+    return (payment_method, str(transaction_id).strip().upper())
+
+def mobile_key(mobile_number):
+    digits = ''.join(ch for ch in str(mobile_number) if ch.isdigit())
+    # 8801XXXXXXXXX and 01XXXXXXXXX are the same number
+    if digits.startswith('880') and len(digits) == 13:
+        digits = digits[2:]
+    return digits
+
+class SubmissionIndex:
+    # Hash index of submission ids by (payment method, transaction id) and
+    # by mobile number. Status changes don't move a submission between
+    # keys, so the index survives approvals without a rebuild.
+
+    def __init__(self, rows=()):
+        self.by_transaction = {}
+        self.by_mobile = {}
+        self.add(rows)
+
+    @classmethod
+    def build(cls, rows):
+        return cls(rows)
+
+    @staticmethod
+    def apply(index, new_rows):
+        index.add(new_rows)
+        return index
+
+    @staticmethod
+    def on_update(index, changed_rows):
+        return index
+
+    def add(self, rows):
+        for row in rows:
+            key = transaction_key(row['payment_method'], row['transaction_id'])
+            self.by_transaction.setdefault(key, []).append(row['id'])
+            self.by_mobile.setdefault(mobile_key(row['mobile_number']), []).append(row['id'])
+
+    def transaction_ids(self, payment_method, transaction_id):
+        return self.by_transaction.get(transaction_key(payment_method, transaction_id), [])
+
+    def mobile_ids(self, mobile_number):
+        return self.by_mobile.get(mobile_key(mobile_number), [])
+
+def name_key(name):
+    # 'Raisul  islam' and 'Raisul Islam' are the same member
+    return ' '.join(str(name).split()).casefold()
+
+class MemberKeys:
+    # Member ids by normalized name and by mobile number. The first member
+    # with a name keeps it; members found by mobile number come first.
+    # without_mobile only holds members with no number on record, the only
+    # ones a name can match when a number is given.
+
+    def __init__(self, rows=()):
+        self.by_name = {}
+        self.by_mobile = {}
+        self.without_mobile = {}
+        self.add(rows)
+
+    @classmethod
+    def build(cls, rows):
+        return cls(rows)
+
+    @staticmethod
+    def apply(keys, rows):
+        keys.add(rows)
+        return keys
+
+    def add(self, rows):
+        for row in rows:
+            self.by_name.setdefault(name_key(row['name']), row['id'])
+            if row.get('mobile_number'):
+                self.by_mobile.setdefault(mobile_key(row['mobile_number']), row['id'])
+            else:
+                self.without_mobile.setdefault(name_key(row['name']), row['id'])
+
+class MemberIndex:
+    # Fund entries grouped by member_id, each group date-ordered like the
+    # ledger pages, with totals per member and per member per year kept as
+    # entries are added. A member's statement or year-end total is then a
+    # lookup instead of a pass over every entry.
+
+    def __init__(self, rows=()):
+        self.entries = {}
+        self.totals = {}
+        self.by_year = {}
+        self.add(rows)
+
+    @classmethod
+    def build(cls, rows):
+        return cls(rows)
+
+    @staticmethod
+    def apply(index, new_rows):
+        index.add(new_rows)
+        return index
+
+    def add(self, rows):
+        for row in rows:
+            member_id = row.get('member_id')
+            if member_id is None:
+                continue
+
+            entries = self.entries.get(member_id)
+            if entries is None:
+                entries = self.entries[member_id] = DateIndex('date')
+            entries.add([row])
+
+            self.totals[member_id] = self.totals.get(member_id, 0) + row['amount']
+            years = self.by_year.setdefault(member_id, {})
+            year = row['date'][:4]
+            years[year] = years.get(year, 0) + row['amount']
+
+    def year_total(self, member_id, year=None):
+        if year is None:
+            return self.totals.get(member_id, 0)
+        return self.by_year.get(member_id, {}).get(year, 0)
+
+class IdOrder:
+    # Rows in id order for "everything after id N" delta queries. Ids only
+    # grow, so appends keep it sorted.
+
+    def __init__(self, rows=()):
+        self.rows = sorted(rows, key=lambda row: row['id'])
+        self.ids = [row['id'] for row in self.rows]
+
+    @classmethod
+    def build(cls, rows):
+        return cls(rows)
+
+    @staticmethod
+    def apply(order, new_rows):
+        for row in new_rows:
+            position = bisect.bisect_right(order.ids, row['id'])
+            order.ids.insert(position, row['id'])
+            order.rows.insert(position, row)
+        return order
+
+    def after(self, last_id, limit):
+        position = bisect.bisect_right(self.ids, last_id)
+        return self.rows[position:position + limit]
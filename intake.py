@@ -0,0 +1,100 @@
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+# Backpressure for the public submission form. RateLimiter turns away
+# clients that submit too often; IntakeQueue hands accepted submissions to
+# one writer thread that stores whatever has queued up in a single write,
+# so a burst of submissions costs a few writes instead of one each, and a
+# full queue is refused (429) instead of piling up behind the disk.
+#
+# Both are per worker process: with N gunicorn workers a client can get up
+# to N times the configured rate.
+
+class RateLimiter:
+    # A token bucket per key (IP address, mobile number): up to `burst`
+    # requests at once, refilled at `rate` tokens per second. The least
+    # recently seen keys are dropped past max_keys.
+
+    def __init__(self, rate, burst, max_keys=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key):
+        # Takes a token; returns 0 if one was available, otherwise the
+        # seconds until the next one
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                wait = 0
+            else:
+                self._buckets[key] = (tokens, now)
+                wait = (1 - tokens) / self.rate
+
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+class IntakeQueue:
+    # commit(items) stores a batch and returns one result per item. The
+    # writer thread starts with the first submission, so it is created in
+    # the worker process rather than in a preloading master.
+
+    def __init__(self, commit, max_pending=200, batch_size=50, linger=0.02):
+        self.commit = commit
+        self.batch_size = batch_size
+        self.linger = linger
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='intake-writer', daemon=True)
+                self._thread.start()
+
+    def submit(self, item):
+        # A Future for the item's result, or None when the queue is full
+        self._start()
+        future = Future()
+        try:
+            self._queue.put_nowait((item, future))
+        except queue.Full:
+            return None
+        return future
+
+    @property
+    def pending(self):
+        return self._queue.qsize()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            # Give submissions arriving at the same moment a chance to join
+            deadline = time.monotonic() + self.linger
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=max(0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+
+            try:
+                results = self.commit([item for item, _ in batch])
+            except Exception as e:
+                logging.exception("Could not store %d queued submissions", len(batch))
+                for _, future in batch:
+                    future.set_exception(e)
+            else:
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
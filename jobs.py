@@ -0,0 +1,249 @@
+import contextvars
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from storage import TABLES, ledger_cache, current_club
+from models import Fund, Expense, FundSubmission, Member
+from exports import (FUND_COLUMNS, EXPENSE_COLUMNS, SUBMISSION_COLUMNS, MEMBER_COLUMNS, LEDGER_COLUMNS,
+                     csv_chunks, gzip_chunks, ledger_rows)
+from helpers import get_monthly_summary
+from uploads import UPLOAD_FOLDER, thumbnail_path
+
+# Slow admin work (full exports, yearly reports, aggregate rebuilds, upload
+# cleanup) runs on a small thread pool instead of inside the request. Every
+# job is a row in the jobs table, so any worker can report its status and
+# serve its result, and jobs cut off by a restart show up as failed rather
+# than running forever. Results that are files are kept in RESULTS_DIR
+# (in a subdirectory per club). A job runs in the club it was started in.
+
+JOBS_TABLE = 'jobs'
+RESULTS_DIR = 'job_results'
+MAX_JOBS = 200
+# Uploads younger than this are never cleaned up: their submission may
+# still be waiting in the intake queue
+UPLOAD_GRACE_SECONDS = 3600
+
+TASKS = {}
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='jobs')
+
+def task(name):
+    def decorator(fn):
+        TASKS[name] = fn
+        return fn
+    return decorator
+
+def _now():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+def _results_dir():
+    club = current_club()
+    return os.path.join(RESULTS_DIR, club) if club else RESULTS_DIR
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, TypeError):
+        pass
+    return True
+
+class Job:
+    @staticmethod
+    def get(job_id):
+        for row in ledger_cache.read(JOBS_TABLE):
+            if row['id'] == job_id:
+                return row
+        return None
+
+    @staticmethod
+    def get_recent(limit=10):
+        return list(reversed(ledger_cache.read(JOBS_TABLE)[-limit:]))
+
+    @staticmethod
+    def result_path(job):
+        result = job.get('result') or {}
+        if job['status'] != 'done' or not result.get('file'):
+            return None
+        return os.path.join(_results_dir(), result['file'])
+
+    @staticmethod
+    def start(kind, params=None, user_id=None):
+        if kind not in TASKS:
+            raise ValueError(f"Unknown job: {kind}")
+
+        with ledger_cache.locked(JOBS_TABLE):
+            job = ledger_cache.append(JOBS_TABLE, [{
+                'kind': kind,
+                'params': params or {},
+                'status': 'queued',
+                'user_id': user_id,
+                'pid': os.getpid(),
+                'created_at': _now(),
+                'started_at': None,
+                'finished_at': None,
+                'result': None,
+                'error': None
+            }])[0]
+            Job._prune()
+
+        _executor.submit(contextvars.copy_context().run, Job._run, job['id'])
+        return job
+
+    @staticmethod
+    def _update(job_id, **changes):
+        with ledger_cache.locked(JOBS_TABLE):
+            job = Job.get(job_id)
+            if job is not None:
+                ledger_cache.update(JOBS_TABLE, [dict(job, **changes)])
+
+    @staticmethod
+    def _run(job_id):
+        job = Job.get(job_id)
+        Job._update(job_id, status='running', started_at=_now())
+        try:
+            result = TASKS[job['kind']](job_id, **job['params'])
+        except Exception as e:
+            logging.exception("Job %s (%s) failed", job_id, job['kind'])
+            Job._update(job_id, status='failed', finished_at=_now(), error=str(e) or type(e).__name__)
+        else:
+            Job._update(job_id, status='done', finished_at=_now(), result=result)
+
+    @staticmethod
+    def _prune():
+        # Forgets finished jobs beyond the newest MAX_JOBS, and their result
+        # files (called with the jobs lock held)
+        rows = ledger_cache.read(JOBS_TABLE)
+        if len(rows) <= MAX_JOBS:
+            return
+
+        kept = []
+        for job in rows[:-MAX_JOBS]:
+            if job['status'] in ('queued', 'running'):
+                kept.append(job)
+                continue
+            path = Job.result_path(job)
+            if path and os.path.exists(path):
+                os.remove(path)
+        ledger_cache.write(JOBS_TABLE, kept + rows[-MAX_JOBS:])
+
+    @staticmethod
+    def recover():
+        # Jobs whose worker process is gone will never finish
+        lost = [job for status in ('queued', 'running')
+                for job in ledger_cache.select(JOBS_TABLE, where={'status': status})
+                if not _pid_alive(job.get('pid'))]
+        for job in lost:
+            Job._update(job['id'], status='failed', finished_at=_now(), error='interrupted by a restart')
+        return len(lost)
+
+def _result_name(job_id, filename):
+    os.makedirs(_results_dir(), exist_ok=True)
+    return f"{job_id}-{filename}"
+
+def _write_chunks(name, chunks):
+    path = os.path.join(_results_dir(), name)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        for chunk in chunks:
+            f.write(chunk)
+    os.replace(tmp_path, path)
+    return os.path.getsize(path)
+
+EXPORTS = {
+    'funds': (FUND_COLUMNS, lambda start, end, year: Fund.iter_entries(start, end)),
+    'expenses': (EXPENSE_COLUMNS, lambda start, end, year: Expense.iter_entries(start, end)),
+    'submissions': (SUBMISSION_COLUMNS, lambda start, end, year: FundSubmission.iter_entries(start, end)),
+    'ledger': (LEDGER_COLUMNS, lambda start, end, year: ledger_rows(Fund.iter_entries(start, end),
+                                                                    Expense.iter_entries(start, end))),
+    'members': (MEMBER_COLUMNS, lambda start, end, year: Member.get_totals(year)),
+}
+
+@task('export')
+def export(job_id, target='ledger', start=None, end=None, year=None, gzip=False):
+    columns, rows = EXPORTS[target]
+    name = _result_name(job_id, f"{target}.csv" + ('.gz' if gzip else ''))
+    chunks = csv_chunks(columns, rows(start, end, year))
+    if gzip:
+        chunks = gzip_chunks(chunks)
+    return {'file': name, 'bytes': _write_chunks(name, chunks)}
+
+@task('yearly-report')
+def yearly_report(job_id, year=None):
+    year = year or datetime.now().strftime('%Y')
+    start, end = f"{year}-01-01", f"{year}-12-31"
+    total_funds = Fund.get_range_total(start, end)
+    total_expenses = Expense.get_range_total(start, end)
+
+    report = {
+        'year': year,
+        'total_funds': total_funds,
+        'total_expenses': total_expenses,
+        'balance': total_funds - total_expenses,
+        'funds_by_method': Fund.get_method_totals(start, end),
+        'monthly_summary': get_monthly_summary(start, end),
+        'members': sorted(Member.get_totals(year), key=lambda member: member['total'], reverse=True),
+    }
+
+    name = _result_name(job_id, f"report-{year}.json")
+    size = _write_chunks(name, [json.dumps(report, indent=4).encode('utf-8')])
+    return {'file': name, 'bytes': size}
+
+@task('rebuild-aggregates')
+def rebuild_aggregates(job_id):
+    result = {}
+    for label, model in (('funds', Fund), ('expenses', Expense)):
+        maintained, rebuilt = model.rebuild_aggregate()
+        result[label] = {
+            'count': rebuilt.count,
+            'total': rebuilt.total,
+            'differences': maintained.differences(rebuilt) if maintained is not None else [],
+        }
+    return result
+
+@task('compact-storage')
+def compact_storage(job_id):
+    # Folds journals into their snapshots (a plain rewrite for the others)
+    result = {}
+    for table in TABLES:
+        if table == JOBS_TABLE:
+            continue
+        with ledger_cache.locked(table):
+            rows = ledger_cache.read(table)
+            ledger_cache.write(table, rows)
+        result[table] = len(rows)
+    return result
+
+@task('cleanup-uploads')
+def cleanup_uploads(job_id):
+    # Screenshots no submission refers to, their thumbnails, and temp files
+    # left by interrupted uploads. Clubs share the upload folder, so every
+    # club's submissions count.
+    referenced = set()
+    for club in (None,) + ledger_cache.clubs:
+        with ledger_cache.using(club):
+            referenced.update(s['screenshot'] for s in FundSubmission.get_all() if s.get('screenshot'))
+    cutoff = time.time() - UPLOAD_GRACE_SECONDS
+    removed = freed = 0
+
+    if not os.path.isdir(UPLOAD_FOLDER):
+        return {'removed': 0, 'bytes': 0}
+
+    for entry in os.scandir(UPLOAD_FOLDER):
+        if not entry.is_file() or entry.name in referenced or entry.stat().st_mtime > cutoff:
+            continue
+
+        paths = [entry.path]
+        if not entry.name.startswith('.upload-'):
+            paths.append(thumbnail_path(entry.name))
+        for path in paths:
+            if os.path.exists(path):
+                freed += os.path.getsize(path)
+                os.remove(path)
+        removed += 1
+
+    return {'removed': removed, 'bytes': freed}
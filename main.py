@@ -1,5 +1,36 @@
-from app import app
+import time
+
+STARTED = time.perf_counter()
+
+import logging
+import os
+from app import app, initialize
 from routes import *
+import api
+import commands
+from models import Fund, Expense, FundSubmission
+from clubs import check_routes
+
+check_routes(app.config['CLUBS'], app.url_map)
+
+# Startups slower than this are logged as a warning
+STARTUP_BUDGET_SECONDS = float(os.environ.get('STARTUP_BUDGET_SECONDS', '3'))
+
+def create_app():
+    # Entry point for gunicorn ('main:create_app()'). With preload_app the
+    # master runs this once: the data files are checked, the admin created
+    # and the ledgers parsed, and every forked worker starts with them cached.
+    initialize()
+    Fund.get_aggregate()
+    Expense.get_aggregate()
+    FundSubmission.get_pending_submissions()
+
+    elapsed = time.perf_counter() - STARTED
+    if elapsed > STARTUP_BUDGET_SECONDS:
+        logging.warning("Startup took %.2fs, over the %.2fs budget", elapsed, STARTUP_BUDGET_SECONDS)
+    else:
+        logging.info("Started in %.2fs", elapsed)
+    return app
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    create_app().run(host="0.0.0.0", port=5000, debug=True)
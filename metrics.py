@@ -0,0 +1,204 @@
+import cProfile
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from flask import Response, before_render_template, current_app, request, template_rendered
+
+# Per-request instrumentation. The storage layer calls record() and timed()
+# as it opens, parses and writes files; the hooks installed by init_app()
+# collect those numbers for each request and add them up per route. Outside
+# a request (CLI commands, background threads) both calls do nothing.
+#
+#   METRICS_HEADERS=1     Server-Timing and X-Storage-* headers on every
+#                         response (always on when the app runs in debug)
+#   GET /metrics          Prometheus text format, per worker process;
+#                         needs "Authorization: Bearer $METRICS_TOKEN" if set
+#   PROFILE_DIR=/tmp/prof requests with ?profile=1 (every request with
+#                         PROFILE_ALL=1) dump a cProfile .prof file there
+
+COUNTERS = ('file_opens', 'bytes_read', 'bytes_written')
+# parse: loading and decoding rows, view: building sorted lists, totals
+# and other derived data, write: saving rows, render: templates
+TIMERS = ('parse', 'view', 'write', 'render')
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current = ContextVar('request_stats', default=None)
+
+class RequestStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.counts = dict.fromkeys(COUNTERS, 0)
+        self.seconds = dict.fromkeys(TIMERS, 0.0)
+        self.status = 500
+        self.profile = None
+        self.profile_path = None
+        self._render_depth = 0
+        self._render_started = None
+
+    @property
+    def duration(self):
+        return time.perf_counter() - self.started
+
+def record(name, amount=1):
+    stats = _current.get()
+    if stats is not None:
+        stats.counts[name] += amount
+
+@contextmanager
+def timed(name):
+    stats = _current.get()
+    if stats is None:
+        yield
+        return
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.seconds[name] += time.perf_counter() - started
+
+class RouteMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = {}
+        self.durations = {}
+        self.totals = {}
+
+    def observe(self, route, method, status, duration, stats):
+        with self._lock:
+            key = (route, method, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+            histogram = self.durations.get(route)
+            if histogram is None:
+                histogram = self.durations[route] = {'buckets': [0] * len(DURATION_BUCKETS), 'sum': 0.0, 'count': 0}
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    histogram['buckets'][index] += 1
+            histogram['sum'] += duration
+            histogram['count'] += 1
+
+            totals = self.totals.setdefault(route, dict.fromkeys(COUNTERS + TIMERS, 0))
+            for name, value in stats.counts.items():
+                totals[name] += value
+            for name, value in stats.seconds.items():
+                totals[name] += value
+
+    def render(self):
+        with self._lock:
+            lines = [
+                '# HELP clubfund_requests_total Requests handled, by route, method and status.',
+                '# TYPE clubfund_requests_total counter',
+            ]
+            for (route, method, status), count in sorted(self.requests.items()):
+                lines.append(f'clubfund_requests_total{{route="{route}",method="{method}",status="{status}"}} {count}')
+
+            lines += [
+                '# HELP clubfund_request_duration_seconds Time spent handling requests, by route.',
+                '# TYPE clubfund_request_duration_seconds histogram',
+            ]
+            for route, histogram in sorted(self.durations.items()):
+                for bound, count in zip(DURATION_BUCKETS, histogram['buckets']):
+                    lines.append(f'clubfund_request_duration_seconds_bucket{{route="{route}",le="{bound}"}} {count}')
+                lines.append(f'clubfund_request_duration_seconds_bucket{{route="{route}",le="+Inf"}} {histogram["count"]}')
+                lines.append(f'clubfund_request_duration_seconds_sum{{route="{route}"}} {histogram["sum"]:.6f}')
+                lines.append(f'clubfund_request_duration_seconds_count{{route="{route}"}} {histogram["count"]}')
+
+            for name, help_text in (
+                ('file_opens', 'Data files opened'),
+                ('bytes_read', 'Bytes of ledger data read'),
+                ('bytes_written', 'Bytes of ledger data written'),
+            ):
+                lines += [f'# HELP clubfund_{name}_total {help_text}, by route.', f'# TYPE clubfund_{name}_total counter']
+                for route, totals in sorted(self.totals.items()):
+                    lines.append(f'clubfund_{name}_total{{route="{route}"}} {totals[name]}')
+
+            for name in TIMERS:
+                lines += [f'# HELP clubfund_{name}_seconds_total Time spent in {name}, by route.',
+                          f'# TYPE clubfund_{name}_seconds_total counter']
+                for route, totals in sorted(self.totals.items()):
+                    lines.append(f'clubfund_{name}_seconds_total{{route="{route}"}} {totals[name]:.6f}')
+
+            return '\n'.join(lines) + '\n'
+
+    def clear(self):
+        with self._lock:
+            self.requests.clear()
+            self.durations.clear()
+            self.totals.clear()
+
+routes = RouteMetrics()
+
+def _route():
+    return request.endpoint or 'unmatched'
+
+def _start():
+    stats = RequestStats()
+    _current.set(stats)
+
+    profile_dir = current_app.config.get('PROFILE_DIR')
+    if profile_dir and (current_app.config.get('PROFILE_ALL') or request.args.get('profile') == '1'):
+        os.makedirs(profile_dir, exist_ok=True)
+        filename = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{request.method}-{_route()}-{os.urandom(3).hex()}.prof"
+        stats.profile_path = os.path.join(profile_dir, filename)
+        stats.profile = cProfile.Profile()
+        stats.profile.enable()
+
+def _finish(response):
+    stats = _current.get()
+    if stats is None:
+        return response
+
+    stats.status = response.status_code
+    if current_app.debug or current_app.config.get('METRICS_HEADERS'):
+        timings = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in stats.seconds.items() if seconds]
+        timings.append(f"total;dur={stats.duration * 1000:.2f}")
+        response.headers['Server-Timing'] = ', '.join(timings)
+        response.headers['X-Storage-File-Opens'] = str(stats.counts['file_opens'])
+        response.headers['X-Storage-Bytes-Read'] = str(stats.counts['bytes_read'])
+        response.headers['X-Storage-Bytes-Written'] = str(stats.counts['bytes_written'])
+    if stats.profile_path:
+        response.headers['X-Profile-File'] = os.path.basename(stats.profile_path)
+    return response
+
+def _teardown(exc):
+    stats = _current.get()
+    if stats is None:
+        return
+    _current.set(None)
+
+    if stats.profile is not None:
+        stats.profile.disable()
+        stats.profile.dump_stats(stats.profile_path)
+    # Streamed responses (CSV exports) are only counted up to here
+    routes.observe(_route(), request.method, stats.status, stats.duration, stats)
+
+def _render_started(sender, template, context, **extra):
+    stats = _current.get()
+    if stats is not None:
+        if stats._render_depth == 0:
+            stats._render_started = time.perf_counter()
+        stats._render_depth += 1
+
+def _render_finished(sender, template, context, **extra):
+    stats = _current.get()
+    if stats is not None and stats._render_depth:
+        stats._render_depth -= 1
+        if stats._render_depth == 0:
+            stats.seconds['render'] += time.perf_counter() - stats._render_started
+
+def metrics_view():
+    token = current_app.config.get('METRICS_TOKEN')
+    if token and request.headers.get('Authorization') != f"Bearer {token}":
+        return Response('unauthorized\n', status=401, mimetype='text/plain')
+    return Response(routes.render(), mimetype='text/plain; version=0.0.4')
+
+def init_app(app):
+    app.before_request(_start)
+    app.after_request(_finish)
+    app.teardown_request(_teardown)
+    before_render_template.connect(_render_started, app)
+    template_rendered.connect(_render_finished, app)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
@@ -1,8 +1,100 @@
-import json
-import os
 from datetime import datetime
 from werkzeug.security import check_password_hash, generate_password_hash
 from flask_login import UserMixin
+from storage import ledger_cache
+from aggregates import LedgerAggregate
+from columns import LedgerColumns
+from search import SearchIndex
+from money import to_poisha, is_legacy_amount
+from indexes import DateIndex, IdOrder, SubmissionIndex, MemberKeys, MemberIndex, transaction_key, mobile_key, name_key
+
+USERS_TABLE = 'users'
+FUNDS_TABLE = 'funds'
+EXPENSES_TABLE = 'expenses'
+SUBMISSIONS_TABLE = 'fund_submissions'
+MEMBERS_TABLE = 'members'
+
+def _by_date(key):
+    # Sort by date (most recent first)
+    return lambda rows: sorted(rows, key=lambda x: x[key], reverse=True)
+
+def _index_by_id(rows):
+    return {row['id']: row for row in rows}
+
+def _apply_by_id(by_id, new_rows):
+    by_id.update(_index_by_id(new_rows))
+    return by_id
+
+def _by_id(table):
+    return ledger_cache.view(table, 'by_id', _index_by_id, _apply_by_id, _apply_by_id)
+
+def _changes_since(table, last_id, limit):
+    # Rows added after last_id, oldest first. Status changes keep a row's
+    # id, so only the id order survives them without a rebuild.
+    order = ledger_cache.view(table, 'id_order', IdOrder.build, IdOrder.apply)
+    return order.after(last_id, limit)
+
+def _submission_index():
+    return ledger_cache.view(SUBMISSIONS_TABLE, 'submission_index', SubmissionIndex.build,
+                             SubmissionIndex.apply, SubmissionIndex.on_update)
+
+def _date_index(table, date_field, field=None, value=None):
+    build, apply, on_update = DateIndex.view(date_field, field, value)
+    return ledger_cache.view(table, ('date_index', field, value), build, apply, on_update)
+
+def _newest(table, date_field, field=None, value=None, limit=None):
+    # SQL backends answer from their date/status indexes without loading the
+    # table; the others keep a DateIndex up to date as rows are written
+    if ledger_cache.backend.indexed:
+        where = {field: value} if field else None
+        return list(ledger_cache.select(table, where=where, order_by=date_field, limit=limit))
+    index = _date_index(table, date_field, field, value)
+    if limit is None:
+        return list(index.iter_newest())
+    return index.page(per_page=limit).items
+
+def _columns(table, label_field):
+    # Built without loading the dict rows when nothing else has (see
+    # LedgerCache.view), so a rollup or a summary holds only the columns
+    build, apply = LedgerColumns.view('date', label_field)
+    return ledger_cache.view(table, 'columns', build, apply, keep_rows=False)
+
+def _count(table):
+    return ledger_cache.view(table, 'count', lambda rows: sum(1 for _ in rows),
+                             lambda count, new_rows: count + len(new_rows), keep_rows=False)
+
+# Text fields and exact-match filters of each table's search index
+SEARCH_FIELDS = {
+    FUNDS_TABLE: ('date', ('name', 'method'), ('method',)),
+    EXPENSES_TABLE: ('date', ('title', 'reason'), ()),
+    SUBMISSIONS_TABLE: ('date_submitted', ('full_name', 'mobile_number', 'transaction_id', 'payment_method'),
+                        ('payment_method', 'status')),
+}
+
+def _search_index(table):
+    build, apply, on_update = SearchIndex.view(*SEARCH_FIELDS[table])
+    return ledger_cache.view(table, 'search', build, apply, on_update)
+
+def _member_keys():
+    return ledger_cache.view(MEMBERS_TABLE, 'member_keys', MemberKeys.build, MemberKeys.apply)
+
+def _member_index():
+    return ledger_cache.view(FUNDS_TABLE, 'member_index', MemberIndex.build, MemberIndex.apply)
+
+def _apply_by_username(by_username, new_rows):
+    # Changed rows replace the cached ones; a new username never shadows an
+    # existing one (register refuses those anyway)
+    for row in new_rows:
+        current = by_username.get(row['username'])
+        if current is None or current['id'] == row['id']:
+            by_username[row['username']] = row
+    return by_username
+
+def _index_by_username(rows):
+    return _apply_by_username({}, rows)
+
+def _by_username():
+    return ledger_cache.view(USERS_TABLE, 'by_username', _index_by_username, _apply_by_username, _apply_by_username)
 
 class User(UserMixin):
     def __init__(self, id, username, password_hash, is_admin=False):
@@ -14,237 +106,644 @@ class User(UserMixin):
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
     
+    @staticmethod
+    def _from_row(user):
+        return User(
+            id=user['id'],
+            username=user['username'],
+            password_hash=user['password'],
+            is_admin=user.get('is_admin', False)
+        )
+    
     @staticmethod
     def get_by_id(user_id):
-        with open('users.json', 'r') as f:
-            users = json.load(f)
-        
-        for user in users:
-            if user['id'] == user_id:
-                return User(
-                    id=user['id'],
-                    username=user['username'],
-                    password_hash=user['password'],
-                    is_admin=user.get('is_admin', False)
-                )
-        return None
+        # Runs on every authenticated request via the user loader
+        user = _by_id(USERS_TABLE).get(user_id)
+        return User._from_row(user) if user else None
     
     @staticmethod
     def get_by_username(username):
-        with open('users.json', 'r') as f:
-            users = json.load(f)
-        
-        for user in users:
-            if user['username'] == username:
-                return User(
-                    id=user['id'],
-                    username=user['username'],
-                    password_hash=user['password'],
-                    is_admin=user.get('is_admin', False)
-                )
-        return None
+        user = _by_username().get(username)
+        return User._from_row(user) if user else None
     
     @staticmethod
     def register(username, password, is_admin=False):
-        with open('users.json', 'r') as f:
-            users = json.load(f)
+        # Hash outside the lock, it is deliberately slow
+        password_hash = generate_password_hash(password)
         
-        # Check if username already exists
-        for user in users:
-            if user['username'] == username:
+        with ledger_cache.locked(USERS_TABLE):
+            # Check if username already exists
+            if username in _by_username():
                 return False
-        
-        # Create new user
-        new_user = {
-            'id': len(users) + 1,
-            'username': username,
-            'password': generate_password_hash(password),
-            'is_admin': is_admin
-        }
-        
-        users.append(new_user)
-        
-        with open('users.json', 'w') as f:
-            json.dump(users, f, indent=4)
+            
+            # Create new user
+            new_user = {
+                'username': username,
+                'password': password_hash,
+                'is_admin': is_admin
+            }
+            
+            ledger_cache.append(USERS_TABLE, [new_user])
         
         return True
 
+def _add_unique(table, fields, entries):
+    # Skips entries identical (on fields) to a stored one or to an earlier
+    # one in the batch, then stores the rest in a single write
+    with ledger_cache.locked(table):
+        seen = {tuple(row[field] for field in fields) for row in ledger_cache.read(table)}
+        new_rows = []
+        for entry in entries:
+            key = tuple(entry[field] for field in fields)
+            if key not in seen:
+                seen.add(key)
+                new_rows.append(entry)
+        
+        if new_rows:
+            ledger_cache.append(table, new_rows)
+    
+    return len(new_rows), len(entries) - len(new_rows)
+
+def migrate_amounts():
+    # Converts amounts still stored as float taka (the old format) to
+    # integer poisha. Converted rows are left alone, so running it again
+    # is harmless. Returns the number of rows changed per table.
+    converted = {}
+    for table in (FUNDS_TABLE, EXPENSES_TABLE, SUBMISSIONS_TABLE):
+        converted[table] = 0
+        if not any(is_legacy_amount(row['amount']) for row in ledger_cache.read(table)):
+            continue
+        
+        with ledger_cache.locked(table):
+            changed = [dict(row, amount=to_poisha(row['amount']))
+                       for row in ledger_cache.read(table) if is_legacy_amount(row['amount'])]
+            if changed:
+                ledger_cache.update(table, changed)
+            converted[table] = len(changed)
+    
+    return converted
+
 class Fund:
+    FIELDS = ('name', 'amount', 'date', 'method')
+    
     @staticmethod
-    def add_entry(name, amount, date, method):
-        with open('funds.json', 'r') as f:
-            funds = json.load(f)
-        
+    def add_entry(name, amount, date, method, member_id=None):
         new_entry = {
-            'id': len(funds) + 1,
             'name': name,
-            'amount': float(amount),
+            'amount': to_poisha(amount),
             'date': date,
-            'method': method
+            'method': method,
+            'member_id': member_id or Member.resolve(name)
         }
         
-        funds.append(new_entry)
-        
-        with open('funds.json', 'w') as f:
-            json.dump(funds, f, indent=4)
+        ledger_cache.append(FUNDS_TABLE, [new_entry])
         
         return True
     
+    @staticmethod
+    def add_entries(entries):
+        # Bulk version of add_entry; returns (added, duplicates skipped)
+        new_entries = [{
+            'name': entry['name'],
+            'amount': to_poisha(entry['amount']),
+            'date': entry['date'],
+            'method': entry['method']
+        } for entry in entries]
+        
+        member_ids = Member.resolve_many([(entry['name'], None) for entry in new_entries])
+        for entry, member_id in zip(new_entries, member_ids):
+            entry['member_id'] = member_id
+        
+        return _add_unique(FUNDS_TABLE, Fund.FIELDS, new_entries)
+    
     @staticmethod
     def get_all():
-        with open('funds.json', 'r') as f:
-            funds = json.load(f)
-        
-        # Sort by date (most recent first)
-        funds.sort(key=lambda x: x['date'], reverse=True)
-        
-        return funds
+        return list(ledger_cache.view(FUNDS_TABLE, 'by_date', _by_date('date')))
+    
+    @staticmethod
+    def get_recent(limit=5):
+        return _newest(FUNDS_TABLE, 'date', limit=limit)
+    
+    @staticmethod
+    def get_page(page=1, per_page=50, start=None, end=None, method=None, cursor=None):
+        index = _date_index(FUNDS_TABLE, 'date', 'method' if method else None, method)
+        return index.page(page, per_page, start, end, cursor)
+    
+    @staticmethod
+    def get_changes(since_id, limit=100):
+        return list(_changes_since(FUNDS_TABLE, since_id, limit))
+    
+    @staticmethod
+    def iter_entries(start=None, end=None, method=None):
+        # Most recent first, without sorting or copying the rows
+        index = _date_index(FUNDS_TABLE, 'date', 'method' if method else None, method)
+        return index.iter_newest(start, end)
     
     @staticmethod
     def get_total():
-        with open('funds.json', 'r') as f:
-            funds = json.load(f)
-        
-        total = sum(entry['amount'] for entry in funds)
-        return total
+        return Fund.get_aggregate().total
+    
+    @staticmethod
+    def get_aggregate():
+        return ledger_cache.view(FUNDS_TABLE, 'aggregate', LedgerAggregate.build, LedgerAggregate.apply,
+                                 keep_rows=False)
+    
+    @staticmethod
+    def rebuild_aggregate():
+        # Recompute from scratch; returns (maintained, rebuilt)
+        return ledger_cache.rebuild_view(FUNDS_TABLE, 'aggregate', LedgerAggregate.build, LedgerAggregate.apply,
+                                         keep_rows=False)
+    
+    @staticmethod
+    def get_columns():
+        return _columns(FUNDS_TABLE, 'method')
+    
+    @staticmethod
+    def get_range_total(start=None, end=None, method=None):
+        return Fund.get_columns().total(start, end, method)
+    
+    @staticmethod
+    def get_monthly_totals(start=None, end=None):
+        return Fund.get_columns().by_month(start, end)
+    
+    @staticmethod
+    def get_method_totals(start=None, end=None):
+        return Fund.get_columns().by_label(start, end)
+    
+    @staticmethod
+    def search(query=None, start=None, end=None, min_amount=None, max_amount=None, method=None, page=1, per_page=50):
+        return _search_index(FUNDS_TABLE).search(query, start, end, min_amount, max_amount, page, per_page,
+                                                 method=method)
 
 class Expense:
+    FIELDS = ('title', 'amount', 'date', 'reason')
+    
     @staticmethod
     def add_entry(title, amount, date, reason):
-        with open('expenses.json', 'r') as f:
-            expenses = json.load(f)
-        
         new_entry = {
-            'id': len(expenses) + 1,
             'title': title,
-            'amount': float(amount),
+            'amount': to_poisha(amount),
             'date': date,
             'reason': reason
         }
         
-        expenses.append(new_entry)
-        
-        with open('expenses.json', 'w') as f:
-            json.dump(expenses, f, indent=4)
+        ledger_cache.append(EXPENSES_TABLE, [new_entry])
         
         return True
     
+    @staticmethod
+    def add_entries(entries):
+        # Bulk version of add_entry; returns (added, duplicates skipped)
+        new_entries = [{
+            'title': entry['title'],
+            'amount': to_poisha(entry['amount']),
+            'date': entry['date'],
+            'reason': entry['reason']
+        } for entry in entries]
+        
+        return _add_unique(EXPENSES_TABLE, Expense.FIELDS, new_entries)
+    
     @staticmethod
     def get_all():
-        with open('expenses.json', 'r') as f:
-            expenses = json.load(f)
-        
-        # Sort by date (most recent first)
-        expenses.sort(key=lambda x: x['date'], reverse=True)
-        
-        return expenses
+        return list(ledger_cache.view(EXPENSES_TABLE, 'by_date', _by_date('date')))
+    
+    @staticmethod
+    def get_recent(limit=5):
+        return _newest(EXPENSES_TABLE, 'date', limit=limit)
+    
+    @staticmethod
+    def get_page(page=1, per_page=50, start=None, end=None, cursor=None):
+        return _date_index(EXPENSES_TABLE, 'date').page(page, per_page, start, end, cursor)
+    
+    @staticmethod
+    def get_changes(since_id, limit=100):
+        return list(_changes_since(EXPENSES_TABLE, since_id, limit))
+    
+    @staticmethod
+    def iter_entries(start=None, end=None):
+        # Most recent first, without sorting or copying the rows
+        return _date_index(EXPENSES_TABLE, 'date').iter_newest(start, end)
+    
+    @staticmethod
+    def search(query=None, start=None, end=None, min_amount=None, max_amount=None, page=1, per_page=50):
+        return _search_index(EXPENSES_TABLE).search(query, start, end, min_amount, max_amount, page, per_page)
     
     @staticmethod
     def get_total():
-        with open('expenses.json', 'r') as f:
-            expenses = json.load(f)
-        
-        total = sum(entry['amount'] for entry in expenses)
-        return total
+        return Expense.get_aggregate().total
+    
+    @staticmethod
+    def get_aggregate():
+        return ledger_cache.view(EXPENSES_TABLE, 'aggregate', LedgerAggregate.build, LedgerAggregate.apply,
+                                 keep_rows=False)
+    
+    @staticmethod
+    def rebuild_aggregate():
+        # Recompute from scratch; returns (maintained, rebuilt)
+        return ledger_cache.rebuild_view(EXPENSES_TABLE, 'aggregate', LedgerAggregate.build, LedgerAggregate.apply,
+                                         keep_rows=False)
+    
+    @staticmethod
+    def get_columns():
+        return _columns(EXPENSES_TABLE, 'title')
+    
+    @staticmethod
+    def get_range_total(start=None, end=None):
+        return Expense.get_columns().total(start, end)
+    
+    @staticmethod
+    def get_monthly_totals(start=None, end=None):
+        return Expense.get_columns().by_month(start, end)
 
 class FundSubmission:
     @staticmethod
     def initialize_file():
-        if not os.path.exists('fund_submissions.json'):
-            with open('fund_submissions.json', 'w') as f:
-                json.dump([], f)
+        ledger_cache.ensure(SUBMISSIONS_TABLE)
     
     @staticmethod
-    def add_submission(full_name, mobile_number, amount, transaction_id, payment_method, screenshot_filename=None):
-        FundSubmission.initialize_file()
-        
-        with open('fund_submissions.json', 'r') as f:
-            submissions = json.load(f)
-        
-        new_submission = {
-            'id': len(submissions) + 1,
+    def add_submission(full_name, mobile_number, amount, transaction_id, payment_method, screenshot_filename=None,
+                       screenshot_hash=None):
+        submission = FundSubmission.new(full_name, mobile_number, amount, transaction_id, payment_method,
+                                        screenshot_filename, screenshot_hash)
+        return FundSubmission.add_submissions([submission])[0]
+    
+    @staticmethod
+    def new(full_name, mobile_number, amount, transaction_id, payment_method, screenshot_filename=None,
+            screenshot_hash=None):
+        return {
             'full_name': full_name,
             'mobile_number': mobile_number,
-            'amount': float(amount),
+            'amount': to_poisha(amount),
             'transaction_id': transaction_id,
             'payment_method': payment_method,
             'screenshot': screenshot_filename,
+            'screenshot_hash': screenshot_hash,
             'date_submitted': datetime.now().strftime('%Y-%m-%d'),
             'status': 'pending'  # pending, approved, rejected
         }
+    
+    @staticmethod
+    def add_submissions(submissions):
+        # Stores submissions made with new() in one write. Returns a bool
+        # per submission: False for a transaction id already submitted
+        # (and not rejected), earlier in the batch included.
+        FundSubmission.initialize_file()
         
-        submissions.append(new_submission)
-        
-        with open('fund_submissions.json', 'w') as f:
-            json.dump(submissions, f, indent=4)
+        results = []
+        accepted = []
+        seen = set()
+        with ledger_cache.locked(SUBMISSIONS_TABLE):
+            for submission in submissions:
+                key = transaction_key(submission['payment_method'], submission['transaction_id'])
+                duplicate = key in seen or FundSubmission.find_duplicates(
+                    submission['payment_method'], submission['transaction_id'])
+                results.append(not duplicate)
+                if not duplicate:
+                    seen.add(key)
+                    accepted.append(submission)
+            
+            if accepted:
+                ledger_cache.append(SUBMISSIONS_TABLE, accepted)
+        
+        return results
+    
+    @staticmethod
+    def get_by_mobile(mobile_number):
+        by_id = _by_id(SUBMISSIONS_TABLE)
+        return [by_id[submission_id] for submission_id in _submission_index().mobile_ids(mobile_number)]
+    
+    @staticmethod
+    def find_duplicates(payment_method, transaction_id, exclude_id=None):
+        # Pending or approved submissions with this transaction id
+        by_id = _by_id(SUBMISSIONS_TABLE)
+        return [by_id[submission_id]
+                for submission_id in _submission_index().transaction_ids(payment_method, transaction_id)
+                if submission_id != exclude_id and by_id[submission_id]['status'] != 'rejected']
+    
+    @staticmethod
+    def duplicate_flags(submissions):
+        # {submission id: [warnings]} for the submissions shown on the dashboard
+        index = _submission_index()
+        by_id = _by_id(SUBMISSIONS_TABLE)
+        flags = {}
         
-        return True
+        for submission in submissions:
+            warnings = []
+            for other in FundSubmission.find_duplicates(submission['payment_method'], submission['transaction_id'],
+                                                        exclude_id=submission['id']):
+                warnings.append(f"Transaction ID also used by submission #{other['id']} ({other['status']})")
+            
+            others = [by_id[i] for i in index.mobile_ids(submission['mobile_number'])
+                      if i != submission['id'] and by_id[i]['status'] == 'pending']
+            if others:
+                warnings.append(f"{len(others)} other pending submission(s) from this mobile number")
+            
+            if warnings:
+                flags[submission['id']] = warnings
+        
+        return flags
+    
+    @staticmethod
+    def rebuild_index():
+        # Recompute from scratch; returns (maintained, rebuilt)
+        return ledger_cache.rebuild_view(SUBMISSIONS_TABLE, 'submission_index', SubmissionIndex.build,
+                                         SubmissionIndex.apply, SubmissionIndex.on_update)
     
     @staticmethod
     def get_all():
         FundSubmission.initialize_file()
         
-        with open('fund_submissions.json', 'r') as f:
-            submissions = json.load(f)
-        
-        # Sort by date (most recent first)
-        submissions.sort(key=lambda x: x['date_submitted'], reverse=True)
-        
-        return submissions
+        return list(ledger_cache.view(SUBMISSIONS_TABLE, 'by_date', _by_date('date_submitted')))
     
     @staticmethod
     def get_pending_submissions():
         FundSubmission.initialize_file()
         
-        with open('fund_submissions.json', 'r') as f:
-            submissions = json.load(f)
+        # Pending submissions, most recent first
+        return _newest(SUBMISSIONS_TABLE, 'date_submitted', 'status', 'pending')
+    
+    @staticmethod
+    def get_page(page=1, per_page=50, start=None, end=None, status=None, cursor=None):
+        FundSubmission.initialize_file()
         
-        # Filter pending submissions and sort by date (most recent first)
-        pending = [s for s in submissions if s['status'] == 'pending']
-        pending.sort(key=lambda x: x['date_submitted'], reverse=True)
+        index = _date_index(SUBMISSIONS_TABLE, 'date_submitted', 'status' if status else None, status)
+        return index.page(page, per_page, start, end, cursor)
+    
+    @staticmethod
+    def get_changes(since_id, limit=100):
+        FundSubmission.initialize_file()
         
-        return pending
+        return list(_changes_since(SUBMISSIONS_TABLE, since_id, limit))
     
     @staticmethod
-    def approve_submission(submission_id):
+    def iter_entries(start=None, end=None, status=None):
         FundSubmission.initialize_file()
         
-        with open('fund_submissions.json', 'r') as f:
-            submissions = json.load(f)
+        index = _date_index(SUBMISSIONS_TABLE, 'date_submitted', 'status' if status else None, status)
+        return index.iter_newest(start, end)
+    
+    @staticmethod
+    def search(query=None, start=None, end=None, min_amount=None, max_amount=None, method=None, status=None, page=1,
+               per_page=50):
+        FundSubmission.initialize_file()
         
-        for submission in submissions:
-            if submission['id'] == submission_id:
-                submission['status'] = 'approved'
-                
-                # Add to funds
-                Fund.add_entry(
-                    name=submission['full_name'],
-                    amount=submission['amount'],
-                    date=submission['date_submitted'],
-                    method=submission['payment_method']
-                )
+        return _search_index(SUBMISSIONS_TABLE).search(query, start, end, min_amount, max_amount, page, per_page,
+                                                       payment_method=method, status=status)
+    
+    @staticmethod
+    def process_submissions(approve_ids=(), reject_ids=()):
+        # Approve and reject many submissions in one pass: one write to
+        # funds.json and one to fund_submissions.json however many there are.
+        # Returns the ids that were actually processed (pending ones only).
+        FundSubmission.initialize_file()
+        
+        decisions = {submission_id: 'rejected' for submission_id in reject_ids}
+        decisions.update({submission_id: 'approved' for submission_id in approve_ids})
+        
+        with ledger_cache.locked(SUBMISSIONS_TABLE):
+            by_id = _by_id(SUBMISSIONS_TABLE)
+            changed = []
+            new_funds = []
+            duplicates = []
+            approved_keys = set()
+            
+            for submission_id, status in decisions.items():
+                submission = by_id.get(submission_id)
+                if submission is None or submission['status'] != 'pending':
+                    continue
                 
-                with open('fund_submissions.json', 'w') as f:
-                    json.dump(submissions, f, indent=4)
+                if status == 'approved':
+                    # Never approve the same transaction twice
+                    key = transaction_key(submission['payment_method'], submission['transaction_id'])
+                    already_approved = any(other['status'] == 'approved' for other in FundSubmission.find_duplicates(
+                        submission['payment_method'], submission['transaction_id'], exclude_id=submission_id))
+                    if already_approved or key in approved_keys:
+                        duplicates.append(submission_id)
+                        continue
+                    approved_keys.add(key)
                 
-                return True
-        
-        return False
+                # Copy before changing: cached rows are shared
+                changed.append(dict(submission, status=status))
+                if status == 'approved':
+                    new_funds.append({
+                        'name': submission['full_name'],
+                        'amount': submission['amount'],
+                        'date': submission['date_submitted'],
+                        'method': submission['payment_method']
+                    })
+            
+            # The submitter's mobile number identifies the member
+            approved = [s for s in changed if s['status'] == 'approved']
+            member_ids = Member.resolve_many([(s['full_name'], s['mobile_number']) for s in approved])
+            for fund, member_id in zip(new_funds, member_ids):
+                fund['member_id'] = member_id
+            
+            if new_funds:
+                ledger_cache.append(FUNDS_TABLE, new_funds)
+            if changed:
+                ledger_cache.update(SUBMISSIONS_TABLE, changed)
+        
+        return {
+            'approved': [s['id'] for s in changed if s['status'] == 'approved'],
+            'rejected': [s['id'] for s in changed if s['status'] == 'rejected'],
+            'duplicates': duplicates,
+        }
+    
+    @staticmethod
+    def approve_submission(submission_id):
+        return bool(FundSubmission.process_submissions(approve_ids=[submission_id])['approved'])
     
     @staticmethod
     def reject_submission(submission_id):
-        FundSubmission.initialize_file()
-        
-        with open('fund_submissions.json', 'r') as f:
-            submissions = json.load(f)
-        
-        for submission in submissions:
-            if submission['id'] == submission_id:
-                submission['status'] = 'rejected'
+        return bool(FundSubmission.process_submissions(reject_ids=[submission_id])['rejected'])
+
+class Member:
+    # A club member. Fund entries carry the member_id they belong to, so
+    # statements and totals come from the per-member index rather than by
+    # matching names across the whole ledger.
+    
+    @staticmethod
+    def get_all():
+        return list(ledger_cache.read(MEMBERS_TABLE))
+    
+    @staticmethod
+    def get_by_id(member_id):
+        return _by_id(MEMBERS_TABLE).get(member_id)
+    
+    @staticmethod
+    def resolve(name, mobile_number=None):
+        return Member.resolve_many([(name, mobile_number)])[0]
+    
+    @staticmethod
+    def resolve_many(people):
+        # Member ids for (name, mobile number or None) pairs, in order. A
+        # known mobile number wins, then the name (ignoring case and extra
+        # spaces); anyone else becomes a new member. A name given with an
+        # unknown number only matches a member with no number on record: a
+        # different number means a different person. All new members are
+        # stored in one write.
+        with ledger_cache.locked(MEMBERS_TABLE):
+            keys = _member_keys()
+            by_id = _by_id(MEMBERS_TABLE)
+            new_members = []
+            new_names = {}
+            new_without_mobile = {}
+            new_mobiles = {}
+            changed = {}
+            ids = []
+            
+            def has_mobile(member_id):
+                if member_id < 0:
+                    return bool(new_members[-member_id - 1]['mobile_number'])
+                return bool((changed.get(member_id) or by_id[member_id]).get('mobile_number'))
+            
+            for name, mobile_number in people:
+                key = name_key(name)
+                mobile = mobile_key(mobile_number) if mobile_number else None
+                if mobile:
+                    member_id = keys.by_mobile.get(mobile) or new_mobiles.get(mobile)
+                    if member_id is None:
+                        member_id = keys.without_mobile.get(key) or new_without_mobile.get(key)
+                        if member_id is not None and has_mobile(member_id):
+                            # Claimed by another number earlier in this batch
+                            member_id = None
+                else:
+                    member_id = keys.by_name.get(key) or new_names.get(key)
                 
-                with open('fund_submissions.json', 'w') as f:
-                    json.dump(submissions, f, indent=4)
+                if member_id is None:
+                    # New members get placeholder ids -1, -2, ... until stored
+                    new_members.append({'name': ' '.join(name.split()), 'mobile_number': mobile_number or None})
+                    member_id = -len(new_members)
+                    new_names.setdefault(key, member_id)
+                    if not mobile:
+                        new_without_mobile.setdefault(key, member_id)
+                elif mobile and not has_mobile(member_id):
+                    # First time we learn this member's number
+                    if member_id < 0:
+                        new_members[-member_id - 1]['mobile_number'] = mobile_number
+                    else:
+                        changed[member_id] = dict(by_id[member_id], mobile_number=mobile_number)
                 
-                return True
-        
-        return False
\ No newline at end of file
+                if mobile:
+                    new_mobiles.setdefault(mobile, member_id)
+                ids.append(member_id)
+            
+            inserted = ledger_cache.append(MEMBERS_TABLE, new_members) if new_members else []
+            if changed:
+                ledger_cache.update(MEMBERS_TABLE, list(changed.values()))
+        
+        return [inserted[-member_id - 1]['id'] if member_id < 0 else member_id for member_id in ids]
+    
+    @staticmethod
+    def get_totals(year=None):
+        # Every member with their total paid, all time or for one year
+        # ('2025'): one lookup per member
+        index = _member_index()
+        return [dict(member, total=index.year_total(member['id'], year))
+                for member in ledger_cache.read(MEMBERS_TABLE)]
+    
+    @staticmethod
+    def get_statement(member_id, start=None, end=None):
+        member = Member.get_by_id(member_id)
+        if member is None:
+            return None
+        
+        index = _member_index()
+        entries = index.entries.get(member_id)
+        items = list(entries.iter_newest(start, end)) if entries else []
+        pending = []
+        if member.get('mobile_number'):
+            pending = [s for s in FundSubmission.get_by_mobile(member['mobile_number']) if s['status'] == 'pending']
+        
+        return {
+            'member': member,
+            'entries': items,
+            'total': sum(entry['amount'] for entry in items),
+            'by_year': dict(sorted(index.by_year.get(member_id, {}).items())),
+            'pending_submissions': pending,
+        }
+
+# Each club's figures for the federation rollup, with the ledger version
+# they were computed at
+_club_summaries = {}
+
+class Federation:
+    # Totals across every club, added up from one small summary per club.
+    # A club's summary is only recomputed after its ledgers change, so the
+    # rollup doesn't load every club's ledgers each time it is asked for.
+    
+    @staticmethod
+    def get_club_summary(club):
+        with ledger_cache.using(club):
+            version = ledger_cache.version(FUNDS_TABLE, EXPENSES_TABLE, MEMBERS_TABLE)
+            cached = _club_summaries.get(club)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+            
+            funds = Fund.get_columns()
+            expenses = Expense.get_columns()
+            summary = {
+                'club': club,
+                'total_funds': funds.total(),
+                'total_expenses': expenses.total(),
+                'balance': funds.total() - expenses.total(),
+                'fund_count': funds.count(),
+                'expense_count': expenses.count(),
+                'member_count': _count(MEMBERS_TABLE),
+                'funds_by_method': funds.by_label(),
+                'funds_by_month': funds.by_month(),
+                'expenses_by_month': expenses.by_month(),
+            }
+            _club_summaries[club] = (version, summary)
+            return summary
+    
+    @staticmethod
+    def get_summary():
+        clubs = [Federation.get_club_summary(club) for club in ledger_cache.clubs]
+        
+        totals = {'total_funds': 0, 'total_expenses': 0, 'balance': 0, 'fund_count': 0, 'expense_count': 0,
+                  'member_count': 0}
+        by_method = {}
+        months = {}
+        for club in clubs:
+            for key in totals:
+                totals[key] += club[key]
+            for method, amount in club['funds_by_method'].items():
+                by_method[method] = by_method.get(method, 0) + amount
+            for month, amount in club['funds_by_month'].items():
+                months.setdefault(month, [0, 0])[0] += amount
+            for month, amount in club['expenses_by_month'].items():
+                months.setdefault(month, [0, 0])[1] += amount
+        
+        return dict(
+            totals,
+            funds_by_method=by_method,
+            monthly=[{'month': month, 'funds': funds, 'expenses': expenses}
+                     for month, (funds, expenses) in sorted(months.items())],
+            clubs=[{key: club[key] for key in ('club',) + tuple(totals)} for club in clubs],
+        )
+
+def link_members():
+    # Gives fund entries from before members existed a member_id. Entries
+    # that came from an approved submission are matched on the submitter's
+    # mobile number, the rest by name. Returns the number of entries linked.
+    unlinked = [row for row in ledger_cache.read(FUNDS_TABLE) if row.get('member_id') is None]
+    if not unlinked:
+        return 0
+    
+    mobiles = {(s['full_name'], s['date_submitted'], s['amount'], s['payment_method']): s['mobile_number']
+               for s in ledger_cache.read(SUBMISSIONS_TABLE) if s['status'] == 'approved'}
+    member_ids = Member.resolve_many([
+        (row['name'], mobiles.get((row['name'], row['date'], row['amount'], row['method'])))
+        for row in unlinked
+    ])
+    
+    with ledger_cache.locked(FUNDS_TABLE):
+        by_id = _by_id(FUNDS_TABLE)
+        changed = [dict(by_id[row['id']], member_id=member_id)
+                   for row, member_id in zip(unlinked, member_ids)
+                   if by_id[row['id']].get('member_id') is None]
+        if changed:
+            ledger_cache.update(FUNDS_TABLE, changed)
+    
+    return len(changed)
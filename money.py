@@ -0,0 +1,25 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+# Amounts are stored and summed as integer poisha (1 taka = 100 poisha), so
+# balances are exact however many entries there are. Taka values only
+# appear at the edges: parsing form and import input, and formatting output.
+
+POISHA_PER_TAKA = 100
+
+def to_poisha(taka):
+    # Decimal and str input convert exactly; floats go through their
+    # shortest repr, so 0.1 becomes 10 poisha and not 9
+    return int((Decimal(str(taka)) * POISHA_PER_TAKA).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+def format_amount(poisha):
+    # '1234.50', the form CSV exports and imports use
+    taka, rest = divmod(abs(poisha), POISHA_PER_TAKA)
+    return f"{'-' if poisha < 0 else ''}{taka}.{rest:02d}"
+
+def format_taka(poisha):
+    taka, rest = divmod(abs(poisha), POISHA_PER_TAKA)
+    return f"{'-' if poisha < 0 else ''}৳{taka:,}.{rest:02d}"
+
+def is_legacy_amount(amount):
+    # Before amounts were stored in poisha they were float taka
+    return isinstance(amount, float)
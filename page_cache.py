@@ -0,0 +1,101 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import make_response, request, session
+from flask_login import current_user
+from jinja2 import nodes
+from jinja2.ext import Extension
+from storage import ledger_cache
+
+# Rendered pages and template fragments cached per ledger version. Any write
+# to funds, expenses or submissions (from any worker) gives a new version,
+# so nothing cached is ever served stale and nothing needs explicit purging.
+
+LEDGER_TABLES = ('funds', 'expenses', 'fund_submissions')
+
+def ledger_version():
+    return ledger_cache.version(*LEDGER_TABLES)
+
+class LRUCache:
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+pages = LRUCache()
+fragments = LRUCache(512)
+
+def _audience():
+    # Pages differ between visitors only in the navigation bar
+    if not current_user.is_authenticated:
+        return 'anonymous'
+    return f"user:{current_user.get_id()}:{'admin' if current_user.is_admin else 'member'}"
+
+def cached_page(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        # Pending flash messages make the page one-off
+        if request.method != 'GET' or session.get('_flashes'):
+            return view(*args, **kwargs)
+
+        version = ledger_version()
+        key = (request.full_path, _audience(), version)
+        cached = pages.get(key)
+        if cached is None:
+            cached = (view(*args, **kwargs), time.time())
+            if isinstance(cached[0], str):
+                pages.set(key, cached)
+            else:
+                return cached[0]
+
+        body, rendered_at = cached
+        response = make_response(body)
+        # Same tag from every worker for the same page, audience and version
+        response.set_etag(hashlib.sha1(repr(key).encode()).hexdigest()[:24])
+        response.last_modified = rendered_at
+        # Browsers revalidate every time and get a 304 while nothing changed
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        response.vary.add('Cookie')
+        return response.make_conditional(request)
+
+    return wrapper
+
+class FragmentCacheExtension(Extension):
+    # {% cache 'recent_funds' %}...{% endcache %} renders the block once per
+    # ledger version
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(self.call_method('_render', args), [], [], body).set_lineno(lineno)
+
+    def _render(self, name, caller):
+        key = (name, ledger_version())
+        value = fragments.get(key)
+        if value is None:
+            value = caller()
+            fragments.set(key, value)
+        return value
@@ -1,39 +1,58 @@
-from flask import render_template, redirect, url_for, flash, request
+from flask import render_template, redirect, url_for, flash, request, session
 from flask_login import login_user, logout_user, login_required, current_user
 from app import app
-from models import User, Fund, Expense, FundSubmission
-from forms import RegisterForm, LoginForm, FundForm, ExpenseForm, FundSubmissionForm
-from datetime import datetime
-import io
-import csv
-from flask import Response
+from models import User, Fund, Expense, FundSubmission, Member
+from helpers import get_monthly_summary, format_currency
+from exports import FUND_COLUMNS, EXPENSE_COLUMNS, SUBMISSION_COLUMNS, MEMBER_COLUMNS, LEDGER_COLUMNS, csv_chunks, gzip_chunks, ledger_rows
+from forms import RegisterForm, LoginForm, FundForm, ExpenseForm, FundSubmissionForm, ImportForm, ModerationForm, JobForm
+from importer import import_entries
 import os
-import uuid
-from werkzeug.utils import secure_filename
+import logging
+from datetime import datetime
+from flask import Response, make_response, stream_with_context, send_file
+from uploads import save_screenshot, screenshot_url
+from page_cache import cached_page, FragmentCacheExtension
+from intake import RateLimiter, IntakeQueue
+from indexes import mobile_key
+from jobs import Job
+from storage import ledger_cache, current_club
+
+# Screenshot links (thumbnails in lists) for the templates
+app.add_template_global(screenshot_url)
+# Amounts are integer poisha: {{ fund.amount|currency }} shows ৳1,234.50
+app.add_template_filter(format_currency, 'currency')
+app.add_template_global(format_currency)
+# {% cache 'name' %}...{% endcache %} for fragments that only change with the ledger
+app.jinja_env.add_extension(FragmentCacheExtension)
 
-# Helper function to save uploaded screenshot
-def save_screenshot(file):
-    if file and file.filename:
-        filename = secure_filename(file.filename)
-        # Generate a unique filename to avoid collisions
-        unique_filename = f"{uuid.uuid4().hex}_{filename}"
-        file_path = os.path.join('static/uploads', unique_filename)
-        file.save(file_path)
-        return unique_filename
-    return None
+def listing_args():
+    # Shared query parameters for paginated listings
+    args = {
+        'page': request.args.get('page', 1, type=int),
+        'per_page': min(max(request.args.get('per_page', 50, type=int), 1), 200),
+        'cursor': request.args.get('cursor') or None,
+    }
+    for name in ('start', 'end'):
+        value = request.args.get(name)
+        try:
+            args[name] = datetime.strptime(value, '%Y-%m-%d').strftime('%Y-%m-%d') if value else None
+        except ValueError:
+            args[name] = None
+    return args
 
 @app.route('/')
+@cached_page
 def home():
-    funds = Fund.get_all()
-    expenses = Expense.get_all()
+    funds = Fund.get_recent(5)
+    expenses = Expense.get_recent(5)
     total_funds = Fund.get_total()
     total_expenses = Expense.get_total()
     current_balance = total_funds - total_expenses
     
     return render_template(
         'home.html', 
-        funds=funds[:5],  # Show only latest 5 entries
-        expenses=expenses[:5],  # Show only latest 5 entries
+        funds=funds,  # Show only latest 5 entries
+        expenses=expenses,  # Show only latest 5 entries
         total_funds=total_funds,
         total_expenses=total_expenses,
         current_balance=current_balance
@@ -68,6 +87,7 @@ def login():
         
         if user and user.check_password(password):
             login_user(user)
+            session['club'] = current_club()
             flash('Login successful!', 'success')
             return redirect(url_for('dashboard'))
         else:
@@ -89,12 +109,15 @@ def dashboard():
         flash('You do not have permission to access the admin dashboard.', 'danger')
         return redirect(url_for('home'))
     
-    funds = Fund.get_all()
-    expenses = Expense.get_all()
+    funds = Fund.get_recent(5)
+    expenses = Expense.get_recent(5)
     total_funds = Fund.get_total()
     total_expenses = Expense.get_total()
     current_balance = total_funds - total_expenses
-    pending_submissions = FundSubmission.get_pending_submissions()
+    pending_page = FundSubmission.get_page(
+        page=request.args.get('pending_page', 1, type=int),
+        status='pending'
+    )
     
     fund_form = FundForm()
     expense_form = ExpenseForm()
@@ -103,12 +126,17 @@ def dashboard():
         'dashboard.html',
         fund_form=fund_form,
         expense_form=expense_form,
-        funds=funds[:5],
-        expenses=expenses[:5],
+        funds=funds,
+        expenses=expenses,
         total_funds=total_funds,
         total_expenses=total_expenses,
         current_balance=current_balance,
-        pending_submissions=pending_submissions
+        pending_submissions=pending_page.items,
+        pending_page=pending_page,
+        moderation_form=ModerationForm(),
+        duplicate_flags=FundSubmission.duplicate_flags(pending_page.items),
+        job_form=JobForm(),
+        jobs=Job.get_recent(10)
     )
 
 @app.route('/funds', methods=['GET', 'POST'])
@@ -136,10 +164,11 @@ def funds():
         flash('Fund entry added successfully!', 'success')
         return redirect(url_for('funds'))
     
-    funds = Fund.get_all()
+    method = request.args.get('method') or None
+    page = Fund.get_page(method=method, **listing_args())
     total_funds = Fund.get_total()
     
-    return render_template('funds.html', funds=funds, total=total_funds, form=form)
+    return render_template('funds.html', funds=page.items, page=page, method=method, total=total_funds, form=form, import_form=ImportForm())
 
 @app.route('/expenses', methods=['GET', 'POST'])
 @login_required
@@ -166,12 +195,13 @@ def expenses():
         flash('Expense entry added successfully!', 'success')
         return redirect(url_for('expenses'))
     
-    expenses = Expense.get_all()
+    page = Expense.get_page(**listing_args())
     total_expenses = Expense.get_total()
     
-    return render_template('expenses.html', expenses=expenses, total=total_expenses, form=form)
+    return render_template('expenses.html', expenses=page.items, page=page, total=total_expenses, form=form, import_form=ImportForm())
 
 @app.route('/summary')
+@cached_page
 def summary():
     funds = Fund.get_all()
     expenses = Expense.get_all()
@@ -179,37 +209,7 @@ def summary():
     total_expenses = Expense.get_total()
     current_balance = total_funds - total_expenses
     
-    # Group funds by month
-    funds_by_month = {}
-    for fund in funds:
-        month_year = datetime.strptime(fund['date'], '%Y-%m-%d').strftime('%B %Y')
-        if month_year not in funds_by_month:
-            funds_by_month[month_year] = 0
-        funds_by_month[month_year] += fund['amount']
-    
-    # Group expenses by month
-    expenses_by_month = {}
-    for expense in expenses:
-        month_year = datetime.strptime(expense['date'], '%Y-%m-%d').strftime('%B %Y')
-        if month_year not in expenses_by_month:
-            expenses_by_month[month_year] = 0
-        expenses_by_month[month_year] += expense['amount']
-    
-    # Get all unique months
-    all_months = sorted(list(set(list(funds_by_month.keys()) + list(expenses_by_month.keys()))), 
-                        key=lambda x: datetime.strptime(x, '%B %Y'), reverse=True)
-    
-    monthly_summary = []
-    for month in all_months:
-        funds_amount = funds_by_month.get(month, 0)
-        expenses_amount = expenses_by_month.get(month, 0)
-        balance = funds_amount - expenses_amount
-        monthly_summary.append({
-            'month': month,
-            'funds': funds_amount,
-            'expenses': expenses_amount,
-            'balance': balance
-        })
+    monthly_summary = get_monthly_summary()
     
     return render_template(
         'summary.html',
@@ -221,6 +221,51 @@ def summary():
         monthly_summary=monthly_summary
     )
 
+@app.route('/import/<kind>', methods=['POST'])
+@login_required
+def import_data(kind):
+    if kind not in ('funds', 'expenses'):
+        return redirect(url_for('dashboard'))
+    
+    if not current_user.is_admin:
+        flash('You do not have permission to import data.', 'danger')
+        return redirect(url_for(kind))
+    
+    form = ImportForm()
+    if not form.validate_on_submit():
+        flash('Please choose a .csv or .jsonl file to import.', 'danger')
+        return redirect(url_for(kind))
+    
+    upload = form.file.data
+    fmt = 'jsonl' if upload.filename.lower().endswith('.jsonl') else 'csv'
+    try:
+        result = import_entries(kind, upload.stream, fmt)
+    except (ValueError, UnicodeDecodeError) as e:
+        flash(f'Could not read the file: {e}', 'danger')
+        return redirect(url_for(kind))
+    
+    flash(f"Imported {result['added']} {kind}, skipped {result['duplicates']} duplicates "
+          f"and {len(result['errors'])} invalid rows.", 'success' if not result['errors'] else 'warning')
+    for error in result['errors'][:5]:
+        flash(error, 'danger')
+    
+    return redirect(url_for(kind))
+
+def csv_download(filename, columns, rows):
+    # Streamed in chunks; ?gzip=1 sends a compressed .csv.gz instead
+    chunks = csv_chunks(columns, rows)
+    mimetype = 'text/csv'
+    if request.args.get('gzip') == '1':
+        chunks = gzip_chunks(chunks)
+        filename += '.gz'
+        mimetype = 'application/gzip'
+    
+    return Response(
+        stream_with_context(chunks),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
 @app.route('/export/funds')
 @login_required
 def export_funds():
@@ -228,20 +273,10 @@ def export_funds():
         flash('You do not have permission to export data.', 'danger')
         return redirect(url_for('funds'))
     
-    funds = Fund.get_all()
-    
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(['ID', 'Name', 'Amount', 'Date', 'Method'])
+    args = listing_args()
+    funds = Fund.iter_entries(args['start'], args['end'], request.args.get('method') or None)
     
-    for fund in funds:
-        writer.writerow([fund['id'], fund['name'], fund['amount'], fund['date'], fund['method']])
-    
-    return Response(
-        output.getvalue(),
-        mimetype='text/csv',
-        headers={'Content-Disposition': 'attachment; filename=funds.csv'}
-    )
+    return csv_download('funds.csv', FUND_COLUMNS, funds)
 
 @app.route('/export/expenses')
 @login_required
@@ -250,43 +285,159 @@ def export_expenses():
         flash('You do not have permission to export data.', 'danger')
         return redirect(url_for('expenses'))
     
-    expenses = Expense.get_all()
+    args = listing_args()
+    expenses = Expense.iter_entries(args['start'], args['end'])
     
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(['ID', 'Title', 'Amount', 'Date', 'Reason'])
+    return csv_download('expenses.csv', EXPENSE_COLUMNS, expenses)
+
+@app.route('/export/submissions')
+@login_required
+def export_submissions():
+    if not current_user.is_admin:
+        flash('You do not have permission to export data.', 'danger')
+        return redirect(url_for('dashboard'))
     
-    for expense in expenses:
-        writer.writerow([expense['id'], expense['title'], expense['amount'], expense['date'], expense['reason']])
+    args = listing_args()
+    submissions = FundSubmission.iter_entries(args['start'], args['end'], request.args.get('status') or None)
     
-    return Response(
-        output.getvalue(),
-        mimetype='text/csv',
-        headers={'Content-Disposition': 'attachment; filename=expenses.csv'}
+    return csv_download('fund_submissions.csv', SUBMISSION_COLUMNS, submissions)
+
+@app.route('/export/ledger')
+@login_required
+def export_ledger():
+    if not current_user.is_admin:
+        flash('You do not have permission to export data.', 'danger')
+        return redirect(url_for('summary'))
+    
+    # Funds and expenses in one date-ordered statement; expenses are negative
+    args = listing_args()
+    rows = ledger_rows(
+        Fund.iter_entries(args['start'], args['end']),
+        Expense.iter_entries(args['start'], args['end'])
     )
+    
+    return csv_download('ledger.csv', LEDGER_COLUMNS, rows)
+
+def year_arg():
+    year = request.args.get('year', '')
+    return year if len(year) == 4 and year.isdigit() else None
+
+@app.route('/export/members')
+@login_required
+def export_members():
+    if not current_user.is_admin:
+        flash('You do not have permission to export data.', 'danger')
+        return redirect(url_for('dashboard'))
+    
+    # Every member's total, all time or for ?year=2025
+    year = year_arg()
+    filename = f"members-{year}.csv" if year else 'members.csv'
+    
+    return csv_download(filename, MEMBER_COLUMNS, Member.get_totals(year))
+
+@app.route('/export/members/<int:member_id>')
+@login_required
+def export_member_statement(member_id):
+    if not current_user.is_admin:
+        flash('You do not have permission to export data.', 'danger')
+        return redirect(url_for('dashboard'))
+    
+    args = listing_args()
+    statement = Member.get_statement(member_id, args['start'], args['end'])
+    if statement is None:
+        flash('Member not found.', 'danger')
+        return redirect(url_for('dashboard'))
+    
+    return csv_download(f"member-{member_id}-statement.csv", FUND_COLUMNS, statement['entries'])
+
+ip_limiter = RateLimiter(app.config['SUBMIT_IP_PER_MINUTE'] / 60, app.config['SUBMIT_IP_BURST'])
+mobile_limiter = RateLimiter(app.config['SUBMIT_MOBILE_PER_MINUTE'] / 60, app.config['SUBMIT_MOBILE_BURST'])
+# Forwarded headers are never trusted unless PROXY_FIX_X_FOR says how many
+# proxies set them; seeing one without it is logged once as a hint
+_proxy_warning = []
+
+def warn_untrusted_proxy():
+    if not _proxy_warning:
+        _proxy_warning.append(True)
+        logging.warning("Request with X-Forwarded-For but PROXY_FIX_X_FOR is not set: all visitors behind "
+                        "the proxy share one per-IP submission limit")
+def store_submissions(items):
+    # Items are (club, submission); one write per club in the batch
+    results = [None] * len(items)
+    by_club = {}
+    for position, (club, submission) in enumerate(items):
+        by_club.setdefault(club, []).append((position, submission))
+    
+    for club, entries in by_club.items():
+        with ledger_cache.using(club):
+            added = FundSubmission.add_submissions([submission for _, submission in entries])
+        for (position, _), result in zip(entries, added):
+            results[position] = result
+    return results
+
+submission_intake = IntakeQueue(
+    store_submissions,
+    max_pending=app.config['INTAKE_MAX_PENDING'],
+    batch_size=app.config['INTAKE_BATCH_SIZE']
+)
+
+def too_many_submissions(form, retry_after, message):
+    flash(message, 'danger')
+    response = make_response(render_template('submit_fund.html', form=form), 429)
+    response.headers['Retry-After'] = str(max(1, int(retry_after + 0.999)))
+    return response
 
 @app.route('/submit_fund', methods=['GET', 'POST'])
 def submit_fund():
     form = FundSubmissionForm()
     
+    if request.method == 'POST':
+        # Checked before the form (and any upload) is processed
+        if 'X-Forwarded-For' in request.headers and not app.config['PROXY_FIX_X_FOR']:
+            warn_untrusted_proxy()
+        wait = ip_limiter.hit(request.remote_addr)
+        if wait:
+            return too_many_submissions(form, wait, 'Too many submissions from your network. Please try again shortly.')
+    
     if form.validate_on_submit():
+        wait = mobile_limiter.hit(mobile_key(form.mobile_number.data))
+        if wait:
+            return too_many_submissions(form, wait, 'Too many submissions for this mobile number. Please try again later.')
+        
+        # Stop early on a known duplicate; the writer checks again when storing
+        if FundSubmission.find_duplicates(form.payment_method.data, form.transaction_id.data):
+            form.transaction_id.errors.append('This transaction ID has already been submitted.')
+            return render_template('submit_fund.html', form=form)
+        
         # Save screenshot if provided
-        screenshot_filename = None
+        screenshot_filename = screenshot_hash = None
         if form.screenshot.data:
-            screenshot_filename = save_screenshot(form.screenshot.data)
-            
-        # Add submission to database
-        FundSubmission.add_submission(
+            screenshot_filename, screenshot_hash = save_screenshot(form.screenshot.data)
+        
+        # Queue the submission for the batching writer
+        ticket = submission_intake.submit((current_club(), FundSubmission.new(
             full_name=form.full_name.data,
             mobile_number=form.mobile_number.data,
             amount=form.amount.data,
             transaction_id=form.transaction_id.data,
             payment_method=form.payment_method.data,
-            screenshot_filename=screenshot_filename
-        )
+            screenshot_filename=screenshot_filename,
+            screenshot_hash=screenshot_hash
+        )))
+        if ticket is None:
+            return too_many_submissions(form, 5, 'We are receiving a lot of submissions right now. Please try again in a minute.')
         
-        flash('Your fund submission has been received and is pending approval.', 'success')
-        return redirect(url_for('home'))
+        try:
+            added = ticket.result(timeout=app.config['INTAKE_WAIT_SECONDS'])
+        except TimeoutError:
+            # Still queued; it will be stored shortly
+            added = True
+        
+        if added:
+            flash('Your fund submission has been received and is pending approval.', 'success')
+            return redirect(url_for('home'))
+        
+        form.transaction_id.errors.append('This transaction ID has already been submitted.')
     
     return render_template('submit_fund.html', form=form)
 
@@ -297,8 +448,11 @@ def approve_submission(submission_id):
         flash('You do not have permission to approve fund submissions.', 'danger')
         return redirect(url_for('home'))
     
-    if FundSubmission.approve_submission(submission_id):
+    result = FundSubmission.process_submissions(approve_ids=[submission_id])
+    if result['approved']:
         flash('Fund submission approved and added to funds.', 'success')
+    elif result['duplicates']:
+        flash('Not approved: this transaction ID has already been approved.', 'danger')
     else:
         flash('Could not find the submission or it was already processed.', 'danger')
     
@@ -317,3 +471,78 @@ def reject_submission(submission_id):
         flash('Could not find the submission or it was already processed.', 'danger')
     
     return redirect(url_for('dashboard'))
+
+@app.route('/moderate_submissions', methods=['POST'])
+@login_required
+def moderate_submissions():
+    if not current_user.is_admin:
+        flash('You do not have permission to moderate fund submissions.', 'danger')
+        return redirect(url_for('home'))
+    
+    form = ModerationForm()
+    submission_ids = request.form.getlist('submission_ids', type=int)
+    if not form.validate_on_submit() or not submission_ids:
+        flash('Select at least one submission and an action.', 'danger')
+        return redirect(url_for('dashboard'))
+    
+    if form.action.data == 'approve':
+        result = FundSubmission.process_submissions(approve_ids=submission_ids)
+        flash(f"{len(result['approved'])} submission(s) approved and added to funds.", 'success')
+    else:
+        result = FundSubmission.process_submissions(reject_ids=submission_ids)
+        flash(f"{len(result['rejected'])} submission(s) rejected.", 'warning')
+    
+    skipped = len(set(submission_ids)) - len(result['approved']) - len(result['rejected'])
+    if result['duplicates']:
+        flash(f"{len(result['duplicates'])} submission(s) not approved: their transaction ID is already approved.", 'danger')
+    skipped = skipped - len(result['duplicates'])
+    if skipped:
+        flash(f'{skipped} submission(s) were not found or already processed.', 'danger')
+    
+    return redirect(url_for('dashboard'))
+
+@app.route('/jobs', methods=['POST'])
+@login_required
+def start_job():
+    if not current_user.is_admin:
+        flash('You do not have permission to run jobs.', 'danger')
+        return redirect(url_for('home'))
+    
+    form = JobForm()
+    if not form.validate_on_submit():
+        flash('Please choose a job and check its options.', 'danger')
+        return redirect(url_for('dashboard'))
+    
+    # Each job only takes the options that apply to it
+    kind = form.task.data
+    params = {}
+    if kind == 'export':
+        params = {
+            'target': form.target.data,
+            'start': form.start.data.strftime('%Y-%m-%d') if form.start.data else None,
+            'end': form.end.data.strftime('%Y-%m-%d') if form.end.data else None,
+            'year': form.year.data or None,
+            'gzip': form.gzip.data
+        }
+    elif kind == 'yearly-report':
+        params = {'year': form.year.data or None}
+    
+    job = Job.start(kind, params, current_user.id)
+    flash(f"Job #{job['id']} ({kind}) started. Its result will appear on the dashboard.", 'info')
+    
+    return redirect(url_for('dashboard'))
+
+@app.route('/jobs/<int:job_id>/download')
+@login_required
+def download_job_result(job_id):
+    if not current_user.is_admin:
+        flash('You do not have permission to export data.', 'danger')
+        return redirect(url_for('home'))
+    
+    job = Job.get(job_id)
+    path = Job.result_path(job) if job else None
+    if path is None or not os.path.exists(path):
+        flash('That job has no result to download.', 'danger')
+        return redirect(url_for('dashboard'))
+    
+    return send_file(os.path.abspath(path), as_attachment=True, download_name=os.path.basename(path))
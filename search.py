@@ -0,0 +1,203 @@
+import bisect
+import heapq
+import re
+from indexes import Page
+
+# Search over one ledger table. Every filter has its own sorted structure:
+#
+#   text     token -> sorted ids (inverted index); a query word matches
+#            every token it is a prefix of, found by bisecting the sorted
+#            vocabulary
+#   dates    (date, -id) keys, as in DateIndex
+#   amounts  (amount, id) keys
+#   facets   (field, value) -> sorted ids, for method and status
+#
+# A query sizes each of its filters first (a bisect or a dict lookup),
+# walks only the smallest candidate set and checks the remaining filters
+# row by row. So its cost follows the most selective filter, not the size
+# of the ledger. All of it is kept up to date as rows are added or changed.
+
+# \w alone would split Bangla words at their vowel signs
+TOKEN = re.compile(r'[\w\u0980-\u09ff]+')
+
+def tokenize(text):
+    return TOKEN.findall(str(text).casefold()) if text else []
+
+def _insert(items, item):
+    items.insert(bisect.bisect_left(items, item), item)
+
+def _remove(items, item):
+    position = bisect.bisect_left(items, item)
+    if position < len(items) and items[position] == item:
+        del items[position]
+
+class SearchIndex:
+    def __init__(self, date_field, text_fields, facet_fields=(), rows=()):
+        self.date_field = date_field
+        self.text_fields = text_fields
+        self.facet_fields = facet_fields
+        self.rows = {}
+        self.postings = {}
+        self.vocabulary = []
+        self.dates = []
+        self.amounts = []
+        self.facets = {}
+
+        # In bulk: appending in id order keeps every id list sorted, and the
+        # other lists are sorted once at the end. Names repeat a lot, so
+        # each distinct text is tokenized once.
+        seen = {}
+        for row in sorted(rows, key=lambda row: row['id']):
+            row_id = row['id']
+            self.rows[row_id] = row
+            text = tuple(row.get(field) for field in text_fields)
+            tokens = seen.get(text)
+            if tokens is None:
+                tokens = seen[text] = self._tokens(row)
+            for token in tokens:
+                self.postings.setdefault(token, []).append(row_id)
+            self.dates.append((row[date_field], -row_id))
+            self.amounts.append((row['amount'], row_id))
+            for field in facet_fields:
+                self.facets.setdefault((field, row.get(field)), []).append(row_id)
+        self.vocabulary = sorted(self.postings)
+        self.dates.sort()
+        self.amounts.sort()
+
+    @classmethod
+    def view(cls, date_field, text_fields, facet_fields=()):
+        # build/apply/on_update for LedgerCache.view()
+        def build(rows):
+            return cls(date_field, text_fields, facet_fields, rows)
+
+        def apply(index, new_rows):
+            for row in new_rows:
+                index._add(row)
+            return index
+
+        def on_update(index, changed_rows):
+            for row in changed_rows:
+                index._remove(row['id'])
+                index._add(row)
+            return index
+
+        return build, apply, on_update
+
+    def _tokens(self, row):
+        return {token for field in self.text_fields for token in tokenize(row.get(field))}
+
+    def _add(self, row):
+        row_id = row['id']
+        self.rows[row_id] = row
+        for token in self._tokens(row):
+            ids = self.postings.get(token)
+            if ids is None:
+                ids = self.postings[token] = []
+                _insert(self.vocabulary, token)
+            # Ids only grow, so this is nearly always an append
+            _insert(ids, row_id)
+        _insert(self.dates, (row[self.date_field], -row_id))
+        _insert(self.amounts, (row['amount'], row_id))
+        for field in self.facet_fields:
+            _insert(self.facets.setdefault((field, row.get(field)), []), row_id)
+
+    def _remove(self, row_id):
+        row = self.rows.pop(row_id, None)
+        if row is None:
+            return
+        for token in self._tokens(row):
+            ids = self.postings[token]
+            _remove(ids, row_id)
+            if not ids:
+                del self.postings[token]
+                _remove(self.vocabulary, token)
+        _remove(self.dates, (row[self.date_field], -row_id))
+        _remove(self.amounts, (row['amount'], row_id))
+        for field in self.facet_fields:
+            _remove(self.facets[(field, row.get(field))], row_id)
+
+    def _word_postings(self, word):
+        # Posting lists of every token starting with word
+        position = bisect.bisect_left(self.vocabulary, word)
+        lists = []
+        while position < len(self.vocabulary) and self.vocabulary[position].startswith(word):
+            lists.append(self.postings[self.vocabulary[position]])
+            position += 1
+        return lists
+
+    def _date_bounds(self, start, end):
+        lo = 0 if start is None else bisect.bisect_left(self.dates, (start, float('-inf')))
+        hi = len(self.dates) if end is None else bisect.bisect_right(self.dates, (end, float('inf')))
+        return lo, max(lo, hi)
+
+    def _amount_bounds(self, low, high):
+        lo = 0 if low is None else bisect.bisect_left(self.amounts, (low, float('-inf')))
+        hi = len(self.amounts) if high is None else bisect.bisect_right(self.amounts, (high, float('inf')))
+        return lo, max(lo, hi)
+
+    def _candidates(self, words, start, end, min_amount, max_amount, facets):
+        # (size, ids) for each filter that narrows the search
+        options = []
+        for word, lists in words.items():
+            options.append((sum(map(len, lists)), lambda lists=lists: (i for ids in lists for i in ids)))
+        if start is not None or end is not None:
+            lo, hi = self._date_bounds(start, end)
+            options.append((hi - lo, lambda lo=lo, hi=hi: (-key[1] for key in self.dates[lo:hi])))
+        if min_amount is not None or max_amount is not None:
+            lo, hi = self._amount_bounds(min_amount, max_amount)
+            options.append((hi - lo, lambda lo=lo, hi=hi: (key[1] for key in self.amounts[lo:hi])))
+        for field, value in facets.items():
+            ids = self.facets.get((field, value), [])
+            options.append((len(ids), lambda ids=ids: iter(ids)))
+        return options
+
+    def search(self, query=None, start=None, end=None, min_amount=None, max_amount=None, page=1, per_page=50,
+               **facets):
+        # Rows matching every filter, newest first like the ledger pages.
+        # Every word of the query has to match (as a prefix); facets are
+        # exact, e.g. method='bKash' or status='pending'.
+        words = {word: self._word_postings(word) for word in tokenize(query)}
+        facets = {field: value for field, value in facets.items() if value is not None}
+        options = self._candidates(words, start, end, min_amount, max_amount, facets)
+
+        if options:
+            _, ids = min(options, key=lambda option: option[0])
+            ids = set(ids())
+        else:
+            ids = list(self.rows)
+
+        # Words with few enough postings are intersected as sets; the rest
+        # are checked against each remaining row
+        unchecked = []
+        for word, lists in words.items():
+            if sum(map(len, lists)) <= 8 * len(ids):
+                ids = {row_id for posting in lists for row_id in posting if row_id in ids}
+            else:
+                unchecked.append(word)
+
+        matches = []
+        for row_id in ids:
+            row = self.rows.get(row_id)
+            if row is None:
+                continue
+            if start is not None and row[self.date_field] < start:
+                continue
+            if end is not None and row[self.date_field] > end:
+                continue
+            if min_amount is not None and row['amount'] < min_amount:
+                continue
+            if max_amount is not None and row['amount'] > max_amount:
+                continue
+            if any(row.get(field) != value for field, value in facets.items()):
+                continue
+            if unchecked:
+                tokens = self._tokens(row)
+                if not all(any(token.startswith(word) for token in tokens) for word in unchecked):
+                    continue
+            matches.append(row)
+
+        # Only the rows up to the requested page need ordering
+        page = max(1, page)
+        offset = (page - 1) * per_page
+        newest = heapq.nlargest(offset + per_page, matches, key=lambda row: (row[self.date_field], row['id']))
+        return Page(newest[offset:], page, per_page, len(matches))
@@ -0,0 +1,767 @@
+import contextvars
+import fcntl
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+import metrics
+
+# Every ledger is a "table" of dict rows with an integer 'id'. Where the rows
+# live is up to the backend (JSON files by default, SQLite or Postgres when
+# configured); LedgerCache sits in front of it and keeps the parsed rows in
+# memory until the backend reports a new version.
+#
+# When the app serves several clubs, each club's tables live in their own
+# backend (a data directory, SQLite file or Postgres schema per club) and
+# ledger_cache routes to the club the current request or job belongs to.
+
+TABLES = {
+    'users': 'users.json',
+    'funds': 'funds.json',
+    'expenses': 'expenses.json',
+    'fund_submissions': 'fund_submissions.json',
+    'members': 'members.json',
+    'jobs': 'jobs.json',
+}
+
+# Columns copied out of each row so the SQL backends can index them
+INDEXED_COLUMNS = {
+    'users': ('username',),
+    'funds': ('date',),
+    'expenses': ('date',),
+    'fund_submissions': ('date_submitted', 'status'),
+    'members': ('name',),
+    'jobs': ('status',),
+}
+
+class FileLock:
+    # Exclusive advisory lock shared by every worker process, re-entrant
+    # within a process. The thread lock keeps threads of one worker from
+    # sharing the flock, which is per open file.
+
+    def __init__(self, path):
+        self.path = path
+        self._thread_lock = threading.RLock()
+        self._fd = None
+        self._depth = 0
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            try:
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            except BaseException:
+                if self._fd is not None:
+                    os.close(self._fd)
+                    self._fd = None
+                self._thread_lock.release()
+                raise
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        self._depth -= 1
+        if self._depth == 0:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+        self._thread_lock.release()
+
+def atomic_write_json(path, data, indent=4):
+    # Readers see either the old file or the new one, never a partial write
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'w') as f:
+            metrics.record('file_opens')
+            json.dump(data, f, indent=indent)
+            f.flush()
+            os.fsync(f.fileno())
+            metrics.record('bytes_written', os.fstat(f.fileno()).st_size)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return os.stat(path)
+
+class JsonBackend:
+    indexed = False
+
+    def __init__(self, data_dir='.'):
+        self.data_dir = data_dir
+        self._locks = {}
+
+    def path(self, table):
+        return os.path.join(self.data_dir, TABLES[table])
+
+    def lock(self, table):
+        if table not in self._locks:
+            self._locks[table] = FileLock(self.path(table) + '.lock')
+        return self._locks[table]
+
+    @staticmethod
+    def _signature(stat):
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def ensure(self, table):
+        if not os.path.exists(self.path(table)):
+            with self.lock(table):
+                if not os.path.exists(self.path(table)):
+                    atomic_write_json(self.path(table), [], indent=None)
+
+    def signature(self, table):
+        return self._signature(os.stat(self.path(table)))
+
+    def load(self, table):
+        with open(self.path(table), 'r') as f:
+            metrics.record('file_opens')
+            metrics.record('bytes_read', os.fstat(f.fileno()).st_size)
+            return json.load(f)
+
+    def iter_rows(self, table):
+        # The rows one at a time, for views built without keeping them
+        return iter(self.load(table))
+
+    def write(self, table, rows):
+        return self._signature(atomic_write_json(self.path(table), rows))
+
+    def append(self, table, rows, new_rows):
+        return self.write(table, rows)
+
+    def after_fork(self):
+        pass
+
+    def update(self, table, rows, changed_rows):
+        return self.write(table, rows)
+
+class JournalBackend(JsonBackend):
+    # Snapshot + append-only journal. The snapshot is the same JSON array
+    # file the JSON backend uses; every insert or change after it is one
+    # line holding the full row in <table>.journal.jsonl. Replay upserts by
+    # id, so applying a line twice is harmless, and a torn last line (no
+    # trailing newline) from a crash is ignored, then cut off by the next
+    # append.
+
+    FSYNC_POLICIES = ('always', 'interval', 'never')
+
+    def __init__(self, data_dir='.', fsync='always', fsync_interval=1.0, compact_bytes=1024 * 1024):
+        super().__init__(data_dir)
+        if fsync not in self.FSYNC_POLICIES:
+            raise ValueError(f"Unknown journal fsync policy: {fsync}")
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.compact_bytes = compact_bytes
+        self._replayed = {}
+        self._last_fsync = {}
+
+    def journal_path(self, table):
+        return os.path.splitext(self.path(table))[0] + '.journal.jsonl'
+
+    def ensure(self, table):
+        super().ensure(table)
+        if not os.path.exists(self.journal_path(table)):
+            open(self.journal_path(table), 'a').close()
+
+    def _journal_signature(self, table):
+        try:
+            return self._signature(os.stat(self.journal_path(table)))
+        except FileNotFoundError:
+            return None
+
+    def signature(self, table):
+        return (super().signature(table), self._journal_signature(table))
+
+    def load(self, table):
+        snapshot = super().signature(table)
+        state = self._replayed.get(table)
+        if state is None or state['snapshot'] != snapshot:
+            rows = super().load(table)
+            state = {
+                'snapshot': snapshot,
+                'journal': None,
+                'offset': 0,
+                'rows': rows,
+                'positions': {row['id']: index for index, row in enumerate(rows)},
+            }
+            self._replayed[table] = state
+        
+        # Only the part of the journal not yet seen is read. Compaction swaps
+        # in a new journal file after the snapshot, so a load in between
+        # pairs the new snapshot with the old journal; when the file is no
+        # longer the one the offset belongs to, it's replayed from the start
+        # (replaying rows the snapshot already has is harmless).
+        try:
+            with open(self.journal_path(table), 'rb') as f:
+                metrics.record('file_opens')
+                stat = os.fstat(f.fileno())
+                if state['journal'] != stat.st_ino or stat.st_size < state['offset']:
+                    state['journal'] = stat.st_ino
+                    state['offset'] = 0
+                f.seek(state['offset'])
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break
+                    state['offset'] += len(line)
+                    metrics.record('bytes_read', len(line))
+                    self._upsert(state, json.loads(line))
+        except FileNotFoundError:
+            pass
+        
+        return list(state['rows'])
+
+    @staticmethod
+    def _upsert(state, row):
+        index = state['positions'].get(row['id'])
+        if index is None:
+            state['positions'][row['id']] = len(state['rows'])
+            state['rows'].append(row)
+        else:
+            state['rows'][index] = row
+
+    def write(self, table, rows):
+        # Compaction: fold everything into a new snapshot, then start a new
+        # (empty) journal file rather than truncating the old one, so readers
+        # can tell the two apart
+        atomic_write_json(self.path(table), rows)
+        path = self.journal_path(table)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        open(tmp_path, 'w').close()
+        os.replace(tmp_path, path)
+        self._replayed.pop(table, None)
+        return self.signature(table)
+
+    def _sync(self, table, f):
+        f.flush()
+        if self.fsync == 'always':
+            os.fsync(f.fileno())
+        elif self.fsync == 'interval':
+            now = time.monotonic()
+            if now - self._last_fsync.get(table, 0) >= self.fsync_interval:
+                os.fsync(f.fileno())
+                self._last_fsync[table] = now
+
+    @staticmethod
+    def _trim_torn_tail(f):
+        # A crash mid-append leaves a last line without its newline. New lines
+        # written after it would be glued onto it and make it unreadable, so
+        # it's cut off first (the caller holds the table lock).
+        end = f.seek(0, os.SEEK_END)
+        if not end:
+            return
+        f.seek(end - 1)
+        if f.read(1) == b'\n':
+            return
+        position = end
+        while position > 0:
+            start = max(0, position - 65536)
+            f.seek(start)
+            newline = f.read(position - start).rfind(b'\n')
+            if newline != -1:
+                f.truncate(start + newline + 1)
+                return
+            position = start
+        f.truncate(0)
+
+    def _journal(self, table, rows, changed_rows):
+        with open(self.journal_path(table), 'a+b') as f:
+            metrics.record('file_opens')
+            self._trim_torn_tail(f)
+            payload = ''.join(json.dumps(row) + '\n' for row in changed_rows).encode('utf-8')
+            f.write(payload)
+            metrics.record('bytes_written', len(payload))
+            self._sync(table, f)
+            size = f.tell()
+        
+        if size >= self.compact_bytes:
+            return self.write(table, rows)
+        return self.signature(table)
+
+    def append(self, table, rows, new_rows):
+        return self._journal(table, rows, new_rows)
+
+    def update(self, table, rows, changed_rows):
+        return self._journal(table, rows, changed_rows)
+
+class SqlBackend:
+    indexed = True
+    placeholder = '?'
+
+    def __init__(self, url):
+        self.url = url
+        self._local = threading.local()
+        self._schema_ready = False
+
+    def connect(self):
+        raise NotImplementedError
+
+    def lock(self, table):
+        raise NotImplementedError
+
+    def connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self.connect()
+        if not self._schema_ready:
+            self._create_schema(conn)
+            self._schema_ready = True
+        return conn
+
+    def _create_schema(self, conn):
+        p = self.placeholder
+        with conn:
+            cur = conn.cursor()
+            cur.execute("CREATE TABLE IF NOT EXISTS ledger_meta (name TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+            for table, columns in INDEXED_COLUMNS.items():
+                column_defs = ''.join(f", {column} TEXT" for column in columns)
+                cur.execute(f"CREATE TABLE IF NOT EXISTS {table} (id INTEGER PRIMARY KEY{column_defs}, data TEXT NOT NULL)")
+                for column in columns:
+                    unique = 'UNIQUE ' if (table, column) == ('users', 'username') else ''
+                    cur.execute(f"CREATE {unique}INDEX IF NOT EXISTS ix_{table}_{column} ON {table} ({column})")
+                cur.execute(f"INSERT INTO ledger_meta (name, version) VALUES ({p}, 0) ON CONFLICT DO NOTHING", (table,))
+            # Pending submissions are listed newest first
+            cur.execute("CREATE INDEX IF NOT EXISTS ix_fund_submissions_status_date ON fund_submissions (status, date_submitted)")
+
+    def ensure(self, table):
+        self.connection()
+
+    def after_fork(self):
+        self._local = threading.local()
+
+    def _bump(self, cur, table):
+        p = self.placeholder
+        cur.execute(f"UPDATE ledger_meta SET version = version + 1 WHERE name = {p}", (table,))
+        cur.execute(f"SELECT version FROM ledger_meta WHERE name = {p}", (table,))
+        return cur.fetchone()[0]
+
+    def _params(self, table, row):
+        data = json.dumps(row)
+        metrics.record('bytes_written', len(data))
+        return [row['id']] + [row.get(column) for column in INDEXED_COLUMNS[table]] + [data]
+
+    @staticmethod
+    def _decode(records):
+        rows = []
+        for (data,) in records:
+            metrics.record('bytes_read', len(data))
+            rows.append(json.loads(data))
+        return rows
+
+    def _insert(self, cur, table, rows):
+        columns = ('id',) + INDEXED_COLUMNS[table] + ('data',)
+        marks = ', '.join([self.placeholder] * len(columns))
+        cur.executemany(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({marks})",
+            [self._params(table, row) for row in rows]
+        )
+
+    def signature(self, table):
+        cur = self.connection().cursor()
+        cur.execute(f"SELECT version FROM ledger_meta WHERE name = {self.placeholder}", (table,))
+        return cur.fetchone()[0]
+
+    def load(self, table):
+        cur = self.connection().cursor()
+        cur.execute(f"SELECT data FROM {table} ORDER BY id")
+        return self._decode(cur.fetchall())
+
+    def iter_rows(self, table, batch=1000):
+        # Decoded a batch at a time, so only the view being built holds the
+        # whole table
+        cur = self.connection().cursor()
+        cur.execute(f"SELECT data FROM {table} ORDER BY id")
+        while True:
+            records = cur.fetchmany(batch)
+            if not records:
+                break
+            yield from self._decode(records)
+
+    def max_id(self, table):
+        cur = self.connection().cursor()
+        cur.execute(f"SELECT MAX(id) FROM {table}")
+        return cur.fetchone()[0] or 0
+
+    def write(self, table, rows):
+        conn = self.connection()
+        with conn:
+            cur = conn.cursor()
+            cur.execute(f"DELETE FROM {table}")
+            self._insert(cur, table, rows)
+            return self._bump(cur, table)
+
+    def append(self, table, rows, new_rows):
+        conn = self.connection()
+        with conn:
+            cur = conn.cursor()
+            self._insert(cur, table, new_rows)
+            return self._bump(cur, table)
+
+    def update(self, table, rows, changed_rows):
+        p = self.placeholder
+        assignments = ', '.join(f"{column} = {p}" for column in INDEXED_COLUMNS[table] + ('data',))
+        conn = self.connection()
+        with conn:
+            cur = conn.cursor()
+            cur.executemany(
+                f"UPDATE {table} SET {assignments} WHERE id = {p}",
+                [self._params(table, row)[1:] + [row['id']] for row in changed_rows]
+            )
+            return self._bump(cur, table)
+
+    def select(self, table, where=None, order_by=None, limit=None):
+        p = self.placeholder
+        sql = f"SELECT data FROM {table}"
+        params = []
+        if where:
+            sql += " WHERE " + ' AND '.join(f"{column} = {p}" for column in where)
+            params.extend(where.values())
+        if order_by:
+            # Newest first; ties keep insertion order like the JSON backend
+            sql += f" ORDER BY {order_by} DESC, id"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        cur = self.connection().cursor()
+        cur.execute(sql, params)
+        return self._decode(cur.fetchall())
+
+class SqliteBackend(SqlBackend):
+    def __init__(self, url):
+        super().__init__(url)
+        self._locks = {}
+
+    def lock(self, table):
+        if table not in self._locks:
+            self._locks[table] = FileLock(f"{self.url}.{table}.lock")
+        return self._locks[table]
+
+    def connect(self):
+        conn = sqlite3.connect(self.url, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+class PostgresBackend(SqlBackend):
+    placeholder = '%s'
+
+    def __init__(self, url, schema=None):
+        super().__init__(url)
+        self.schema = schema
+
+    def connect(self):
+        import psycopg2
+        conn = psycopg2.connect(self.url)
+        if self.schema:
+            with conn:
+                cur = conn.cursor()
+                cur.execute(f"CREATE SCHEMA IF NOT EXISTS {self.schema}")
+                cur.execute(f"SET search_path TO {self.schema}")
+        return conn
+
+    @contextmanager
+    def lock(self, table):
+        # Session-level advisory lock; re-entrant like FileLock
+        conn = self.connection()
+        with conn:
+            conn.cursor().execute("SELECT pg_advisory_lock(hashtext(%s))", (self._lock_name(table),))
+        try:
+            yield self
+        finally:
+            with conn:
+                conn.cursor().execute("SELECT pg_advisory_unlock(hashtext(%s))", (self._lock_name(table),))
+
+    def _lock_name(self, table):
+        return f"{self.schema}.{table}" if self.schema else table
+
+def create_backend(name='json', url=None, data_dir='.', schema=None, **options):
+    # data_dir holds the JSON files, and relative SQLite paths; schema is
+    # the Postgres schema (the connection's default one if None)
+    if name == 'json':
+        return JsonBackend(data_dir)
+    if name == 'journal':
+        return JournalBackend(data_dir, **options)
+    if name == 'sqlite':
+        path = url or 'club_fund.db'
+        if path.startswith('sqlite:///'):
+            path = path[len('sqlite:///'):]
+        if data_dir != '.' and not os.path.isabs(path):
+            path = os.path.join(data_dir, path)
+        return SqliteBackend(path)
+    if name in ('postgres', 'postgresql'):
+        return PostgresBackend(url, schema)
+    raise ValueError(f"Unknown storage backend: {name}")
+
+def _max_id(rows):
+    return max((row['id'] for row in rows), default=0)
+
+def _apply_max_id(max_id, new_rows):
+    return max(max_id, _max_id(new_rows))
+
+class LedgerCache:
+    # Cached rows are shared between callers, so they must never be mutated
+    # in place: copy a row before changing it and pass the copy to update().
+
+    def __init__(self, backend=None):
+        self.backend = backend or JsonBackend()
+        self._entries = {}
+        self._lock = threading.RLock()
+
+    def configure(self, backend):
+        with self._lock:
+            self.backend = backend
+            self._entries.clear()
+
+    def ensure(self, table):
+        self.backend.ensure(table)
+
+    def after_fork(self):
+        # Parsed rows and views loaded before a fork stay valid (they're
+        # checked against the backend's signature on every read), but
+        # connections must not be shared with the parent
+        with self._lock:
+            self.backend.after_fork()
+
+    @contextmanager
+    def locked(self, table):
+        # Holds the table's cross-process write lock. Reads inside the block
+        # see the latest committed rows, so read-check-write sequences (and
+        # id allocation) cannot interleave with another worker's.
+        with self._lock:
+            with self.backend.lock(table):
+                yield
+
+    def _entry(self, table):
+        try:
+            signature = self.backend.signature(table)
+        except FileNotFoundError:
+            # Data files are created on first use rather than at startup
+            self.backend.ensure(table)
+            signature = self.backend.signature(table)
+        entry = self._entries.get(table)
+        if entry is None or entry['signature'] != signature:
+            entry = {'signature': signature, 'rows': None, 'views': {}, 'appliers': {}, 'updaters': {}}
+            self._entries[table] = entry
+        return entry
+
+    def _rows(self, table, entry):
+        if entry['rows'] is None:
+            with metrics.timed('parse'):
+                entry['rows'] = self.backend.load(table)
+        return entry['rows']
+
+    def read(self, table):
+        with self._lock:
+            return self._rows(table, self._entry(table))
+
+    def view(self, table, name, build, apply=None, on_update=None, keep_rows=True):
+        # Derived data (sorted lists, totals, filters) computed once per
+        # version of the table. Views given an apply(value, new_rows) hook
+        # are carried across append(), and views given an
+        # on_update(value, changed_rows) hook across update(), instead of
+        # being rebuilt. With keep_rows=False a view that stands in for the
+        # rows (columns, totals) is built from the backend's rows as they
+        # are read, unless they are loaded already, and the rows aren't
+        # kept; build() then gets an iterator rather than a list.
+        with self._lock:
+            entry = self._entry(table)
+            if name not in entry['views']:
+                if keep_rows or entry['rows'] is not None:
+                    rows = self._rows(table, entry)
+                else:
+                    rows = self.backend.iter_rows(table)
+                with metrics.timed('view'):
+                    entry['views'][name] = build(rows)
+                if apply is not None:
+                    entry['appliers'][name] = apply
+                if on_update is not None:
+                    entry['updaters'][name] = on_update
+            return entry['views'][name]
+
+    def rebuild_view(self, table, name, build, apply=None, on_update=None, keep_rows=True):
+        with self._lock:
+            entry = self._entry(table)
+            previous = entry['views'].pop(name, None)
+            return previous, self.view(table, name, build, apply, on_update, keep_rows)
+
+    def select(self, table, where=None, order_by=None, limit=None):
+        # Indexed backends answer directly without loading the whole table;
+        # otherwise filter and sort the cached rows. Either way the result is
+        # kept until the table changes.
+        name = ('select', tuple((where or {}).items()), order_by, limit)
+        with self._lock:
+            entry = self._entry(table)
+            if name not in entry['views']:
+                if self.backend.indexed:
+                    with metrics.timed('parse'):
+                        result = self.backend.select(table, where, order_by, limit)
+                else:
+                    rows = self._rows(table, entry)
+                    with metrics.timed('view'):
+                        result = [row for row in rows
+                                  if all(row.get(column) == value for column, value in (where or {}).items())]
+                        if order_by:
+                            result.sort(key=lambda row: row[order_by], reverse=True)
+                        if limit is not None:
+                            result = result[:limit]
+                entry['views'][name] = result
+            return entry['views'][name]
+
+    def _replace(self, table, signature, rows):
+        entry = {'signature': signature, 'rows': rows, 'views': {}, 'appliers': {}, 'updaters': {}}
+        self._entries[table] = entry
+        return entry
+
+    def write(self, table, rows):
+        with self.locked(table):
+            with metrics.timed('write'):
+                signature = self.backend.write(table, rows)
+            self._replace(table, signature, rows)
+
+    def append(self, table, new_rows):
+        # Rows without an 'id' get the next ones after the highest id in the
+        # table. Ids are never reused since rows are never deleted. Indexed
+        # backends get the highest id from the database and only receive the
+        # new rows, so the table isn't loaded (or copied) to add to it; the
+        # cached rows are dropped and loaded again if something reads them.
+        with self.locked(table):
+            previous = self._entry(table)
+            if self.backend.indexed:
+                next_id = self.backend.max_id(table) + 1
+            else:
+                next_id = self.view(table, 'max_id', _max_id, _apply_max_id) + 1
+            
+            inserted = []
+            for row in new_rows:
+                if 'id' not in row:
+                    row = dict(id=next_id, **row)
+                next_id = max(next_id, row['id'] + 1)
+                inserted.append(row)
+            
+            rows = None if self.backend.indexed else self._rows(table, previous) + inserted
+            with metrics.timed('write'):
+                signature = self.backend.append(table, rows, inserted)
+            entry = self._replace(table, signature, rows)
+            for name, apply in previous['appliers'].items():
+                entry['views'][name] = apply(previous['views'][name], inserted)
+                entry['appliers'][name] = apply
+                if name in previous['updaters']:
+                    entry['updaters'][name] = previous['updaters'][name]
+            return inserted
+
+    def update(self, table, changed_rows):
+        with self.locked(table):
+            previous = self._entry(table)
+            rows = None
+            if not self.backend.indexed:
+                changed = {row['id']: row for row in changed_rows}
+                rows = [changed.get(row['id'], row) for row in self._rows(table, previous)]
+            with metrics.timed('write'):
+                signature = self.backend.update(table, rows, changed_rows)
+            entry = self._replace(table, signature, rows)
+            for name, on_update in previous['updaters'].items():
+                entry['views'][name] = on_update(previous['views'][name], changed_rows)
+                entry['updaters'][name] = on_update
+                if name in previous['appliers']:
+                    entry['appliers'][name] = previous['appliers'][name]
+            return changed_rows
+
+    def version(self, *tables):
+        # Short token that changes whenever any of the tables is written,
+        # by this process or another one
+        with self._lock:
+            signatures = tuple(self.backend.signature(table) for table in tables)
+        return hashlib.sha1(repr(signatures).encode()).hexdigest()[:16]
+
+    def invalidate(self, table=None):
+        with self._lock:
+            if table is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(table, None)
+
+# (club name, its LedgerCache) for the running request or job; (None, None)
+# is the default ledgers, the only ones when the app serves a single club.
+# Jobs and other threads started with a copy of the context keep their club.
+_active_club = contextvars.ContextVar('active_club', default=(None, None))
+
+def current_club():
+    return _active_club.get()[0]
+
+class ClubLedgerCache:
+    # Stands in for the current club's LedgerCache: every LedgerCache method
+    # called on it goes to that club's cache. A club's cache (and backend)
+    # is created when the club is first used, and past max_clubs the least
+    # recently used ones are dropped, so memory follows the clubs that are
+    # active rather than how many there are. A request or job holds on to
+    # its club's cache until it finishes, even if it is dropped meanwhile.
+
+    def __init__(self):
+        self.default = LedgerCache()
+        self.clubs = ()
+        self.max_clubs = 8
+        self._club_backend = None
+        self._caches = OrderedDict()
+        self._lock = threading.Lock()
+
+    def configure(self, backend, clubs=(), club_backend=None, max_clubs=8):
+        # club_backend(name) creates the backend of one club
+        with self._lock:
+            self.default.configure(backend)
+            self.clubs = tuple(clubs)
+            self._club_backend = club_backend
+            self.max_clubs = max_clubs
+            self._caches.clear()
+
+    def club(self, name):
+        if name not in self.clubs:
+            raise KeyError(f"Unknown club: {name}")
+        with self._lock:
+            cache = self._caches.get(name)
+            if cache is None:
+                cache = self._caches[name] = LedgerCache(self._club_backend(name))
+            self._caches.move_to_end(name)
+            while len(self._caches) > self.max_clubs:
+                self._caches.popitem(last=False)
+            return cache
+
+    def current(self):
+        cache = _active_club.get()[1]
+        return self.default if cache is None else cache
+
+    def activate(self, name):
+        # Makes name (None for the default ledgers) the current club until
+        # deactivate(token)
+        return _active_club.set((name, None if name is None else self.club(name)))
+
+    def deactivate(self, token):
+        _active_club.reset(token)
+
+    @contextmanager
+    def using(self, name):
+        token = self.activate(name)
+        try:
+            yield
+        finally:
+            self.deactivate(token)
+
+    def version(self, *tables):
+        # Two clubs' tables can be at the same version (SQL backends count
+        # from 0), so the club is part of it
+        version = self.current().version(*tables)
+        name = current_club()
+        if name is None:
+            return version
+        return hashlib.sha1(f"{name}:{version}".encode()).hexdigest()[:16]
+
+    def after_fork(self):
+        with self._lock:
+            caches = [self.default] + list(self._caches.values())
+        for cache in caches:
+            cache.after_fork()
+
+    def __getattr__(self, name):
+        return getattr(self.current(), name)
+
+ledger_cache = ClubLedgerCache()
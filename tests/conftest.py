@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    # The app with empty JSON ledgers in a temporary directory
+    monkeypatch.chdir(tmp_path)
+    import main
+    from storage import ledger_cache
+    ledger_cache.invalidate()
+    with main.app.test_request_context():
+        yield main.app
+    ledger_cache.invalidate()
@@ -0,0 +1,41 @@
+from backups import BackupStore, CHUNK_ROWS
+from models import Fund
+from storage import ledger_cache
+
+def _funds(count, start=0):
+    return [{'name': f"Member {i % 50}", 'amount': 100 + i, 'date': f"2025-01-{i % 28 + 1:02d}", 'method': 'Cash'}
+            for i in range(start, start + count)]
+
+def test_snapshot_change_restore_round_trip(app, tmp_path):
+    store = BackupStore(str(tmp_path / 'backups'))
+    Fund.add_entries(_funds(30))
+    before = ledger_cache.read('funds')
+    manifest = store.snapshot()
+
+    Fund.add_entries(_funds(5, start=30))
+    changed = dict(before[0], amount=1)
+    ledger_cache.update('funds', [changed])
+
+    previous, restored = store.restore(store.find())
+    assert ledger_cache.read('funds') == before
+    assert restored['funds'] == 30
+    # The state replaced by the restore was snapshotted first
+    assert store.load(previous)['funds'][0] == changed
+    assert [m['id'] for m in store.list()] == [manifest['id'], previous['id']]
+
+def test_snapshots_share_unchanged_chunks(app, tmp_path):
+    store = BackupStore(str(tmp_path / 'backups'))
+    Fund.add_entries(_funds(CHUNK_ROWS * 2 + 10))
+    first = store.snapshot()
+
+    again = store.snapshot()
+    assert again['bytes_written'] == 0
+    assert again['tables'] == first['tables']
+
+    Fund.add_entries(_funds(5, start=CHUNK_ROWS * 3))
+    third = store.snapshot()
+    first_chunks = first['tables']['funds']['chunks']
+    third_chunks = third['tables']['funds']['chunks']
+    assert len(third_chunks) == len(first_chunks)
+    assert third_chunks[:-1] == first_chunks[:-1]
+    assert third_chunks[-1] != first_chunks[-1]
@@ -0,0 +1,21 @@
+import io
+
+from importer import import_entries
+
+def test_bad_jsonl_rows_are_row_errors(app):
+    source = io.BytesIO(
+        b'{"name": "Rahim", "amount": "500", "date": "2025-01-02", "method": "Cash"}\n'
+        b'{"name": "Karim", "amount\n'
+        b'[1, 2]\n'
+        b'5\n'
+        b'{"name": "Selim", "amount": "300", "date": "2025-01-03", "method": "bKash"}\n'
+    )
+
+    result = import_entries('funds', source, 'jsonl')
+
+    assert result['errors'] == [
+        "row 2: invalid JSON",
+        "row 3: expected an object with the entry's fields",
+        "row 4: expected an object with the entry's fields",
+    ]
+    assert result['valid'] == result['added'] == 2
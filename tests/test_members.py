@@ -0,0 +1,38 @@
+from models import Member
+
+def test_known_mobile_number_wins_over_the_name(app):
+    rahim = Member.resolve('Md Rahim', '01711111111')
+
+    assert Member.resolve('Rahim Uddin', '01711111111') == rahim
+    assert Member.resolve('Md Rahim', '+8801711111111') == rahim
+
+def test_name_matches_a_member_with_no_number_on_record(app):
+    rahim = Member.resolve('Md Rahim')
+
+    assert Member.resolve('md  RAHIM', '01711111111') == rahim
+    assert Member.get_by_id(rahim)['mobile_number'] == '01711111111'
+
+def test_same_name_with_a_different_number_is_a_new_member(app):
+    first = Member.resolve('Md Rahim', '01711111111')
+    second = Member.resolve('Md Rahim', '01822222222')
+
+    assert first != second
+    assert Member.resolve('Md Rahim', '01822222222') == second
+    assert Member.get_by_id(first)['mobile_number'] == '01711111111'
+
+def test_new_members_in_one_batch(app):
+    ids = Member.resolve_many([
+        ('Karim', None),
+        ('Karim', '01900000000'),
+        ('Karim', '01900000001'),
+        ('Selim', '01500000000'),
+        ('Karim', '01900000000'),
+        ('Selim', '01500000001'),
+    ])
+
+    karim, karim_too, other_karim, selim, karim_again, other_selim = ids
+    assert karim == karim_too == karim_again
+    assert len({karim, other_karim, selim, other_selim}) == 4
+    assert all(member_id > 0 for member_id in ids)
+    assert Member.get_by_id(karim)['mobile_number'] == '01900000000'
+    assert len(Member.get_all()) == 4
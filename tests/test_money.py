@@ -0,0 +1,32 @@
+from decimal import Decimal
+
+from models import migrate_amounts
+from money import to_poisha
+from storage import ledger_cache
+
+def test_to_poisha_from_float():
+    assert to_poisha(0.1) == 10
+    assert to_poisha(1234.56) == 123456
+    assert to_poisha(2.675) == 268
+    assert to_poisha(500) == 50000
+
+def test_to_poisha_from_decimal_and_str():
+    assert to_poisha(Decimal('1234.565')) == 123457
+    assert to_poisha(Decimal('0.01')) == 1
+    assert to_poisha('99.99') == 9999
+    assert to_poisha('500') == 50000
+
+def test_migrate_amounts_twice_changes_nothing(app):
+    ledger_cache.write('funds', [
+        {'id': 1, 'name': 'Rahim', 'amount': 500.5, 'date': '2025-01-01', 'method': 'Cash'},
+        {'id': 2, 'name': 'Karim', 'amount': 20000, 'date': '2025-01-02', 'method': 'bKash'},
+    ])
+    ledger_cache.write('expenses', [{'id': 1, 'title': 'Tea', 'amount': 0.1, 'date': '2025-01-03', 'reason': ''}])
+
+    assert migrate_amounts() == {'funds': 1, 'expenses': 1, 'fund_submissions': 0}
+    migrated = {table: ledger_cache.read(table) for table in ('funds', 'expenses')}
+    assert [row['amount'] for row in migrated['funds']] == [50050, 20000]
+    assert migrated['expenses'][0]['amount'] == 10
+
+    assert migrate_amounts() == {'funds': 0, 'expenses': 0, 'fund_submissions': 0}
+    assert {table: ledger_cache.read(table) for table in ('funds', 'expenses')} == migrated
@@ -0,0 +1,36 @@
+from search import SearchIndex
+
+def _funds():
+    rows = []
+    for i in range(1, 281):
+        rows.append({
+            'id': i,
+            'name': f"Member {i % 17}",
+            'amount': (i % 40 + 1) * 500,
+            'date': f"2025-01-{i % 28 + 1:02d}",
+            'method': ('bKash', 'Nagad', 'Cash')[i % 3],
+        })
+    return rows
+
+def _expected(rows, start, end, low, high):
+    return sorted(row['id'] for row in rows
+                  if start <= row['date'] <= end and low <= row['amount'] <= high)
+
+def test_date_range_combined_with_amount_range():
+    rows = _funds()
+    index = SearchIndex('date', ('name', 'method'), ('method',), rows)
+
+    page = index.search(start='2025-01-28', end='2025-01-28', min_amount=100, max_amount=10000, per_page=1000)
+
+    expected = _expected(rows, '2025-01-28', '2025-01-28', 100, 10000)
+    assert expected
+    assert page.total == len(expected)
+    assert sorted(row['id'] for row in page.items) == expected
+
+def test_narrow_amount_range_with_wide_date_range():
+    rows = _funds()
+    index = SearchIndex('date', ('name', 'method'), ('method',), rows)
+
+    page = index.search(start='2025-01-01', end='2025-01-20', min_amount=1000, max_amount=1000, per_page=1000)
+
+    assert sorted(row['id'] for row in page.items) == _expected(rows, '2025-01-01', '2025-01-20', 1000, 1000)
@@ -0,0 +1,78 @@
+import storage
+from storage import JournalBackend, LedgerCache, SqliteBackend
+from columns import LedgerColumns
+
+def test_append_after_torn_journal_line(tmp_path):
+    backend = JournalBackend(str(tmp_path), fsync='never')
+    backend.ensure('funds')
+    first = {'id': 1, 'name': 'Rahim', 'amount': 50000}
+    backend.append('funds', [first], [first])
+
+    # A crash in the middle of the next append
+    with open(backend.journal_path('funds'), 'ab') as f:
+        f.write(b'{"id": 2, "name": "Kar')
+    assert backend.load('funds') == [first]
+
+    third = {'id': 3, 'name': 'Karim', 'amount': 20000}
+    backend.append('funds', [first, third], [third])
+    assert JournalBackend(str(tmp_path)).load('funds') == [first, third]
+    assert backend.load('funds') == [first, third]
+
+def test_sqlite_append_and_update_leave_the_table_unloaded(tmp_path):
+    cache = LedgerCache(SqliteBackend(str(tmp_path / 'club_fund.db')))
+    cache.write('funds', [{'id': 7, 'name': 'Rahim', 'amount': 50000, 'date': '2025-01-01'}])
+    total = cache.view('funds', 'total', lambda rows: sum(row['amount'] for row in rows),
+                       lambda value, new_rows: value + sum(row['amount'] for row in new_rows))
+
+    loads = []
+    load = cache.backend.load
+    cache.backend.load = lambda table: loads.append(table) or load(table)
+    inserted = cache.append('funds', [{'name': 'Karim', 'amount': 20000, 'date': '2025-01-02'}])
+    assert inserted[0]['id'] == 8
+    assert cache.view('funds', 'total', None) == total + 20000
+    cache.update('funds', [dict(inserted[0], amount=25000)])
+    assert loads == []
+
+    assert [row['amount'] for row in cache.read('funds')] == [50000, 25000]
+    assert loads == ['funds']
+
+def test_load_between_snapshot_and_new_journal(tmp_path, monkeypatch):
+    writer = JournalBackend(str(tmp_path), fsync='never')
+    reader = JournalBackend(str(tmp_path), fsync='never')
+    writer.ensure('funds')
+    rows = [{'id': i, 'name': f"Member {i}", 'amount': 1000 * i} for i in range(1, 4)]
+    writer.append('funds', rows, rows)
+    assert reader.load('funds') == rows
+
+    # The reader loads after compaction wrote the snapshot but before it
+    # started the new journal
+    write_snapshot = storage.atomic_write_json
+    def write_and_read(path, data, **kwargs):
+        stat = write_snapshot(path, data, **kwargs)
+        reader.load('funds')
+        return stat
+    monkeypatch.setattr(storage, 'atomic_write_json', write_and_read)
+    writer.write('funds', rows)
+    monkeypatch.undo()
+
+    fourth = {'id': 4, 'name': 'Member 4', 'amount': 4000}
+    writer.append('funds', rows + [fourth], [fourth])
+    assert reader.load('funds') == rows + [fourth]
+    assert LedgerCache(reader).append('funds', [{'name': 'Member 5', 'amount': 5000}])[0]['id'] == 5
+
+def test_columns_built_without_keeping_the_rows(tmp_path):
+    cache = LedgerCache(SqliteBackend(str(tmp_path / 'club_fund.db')))
+    rows = [{'id': i, 'name': 'Rahim', 'amount': 1000 * i, 'date': f"2025-0{4 - i}-01", 'method': 'Cash'}
+            for i in range(1, 4)]
+    cache.write('funds', rows)
+    cache = LedgerCache(SqliteBackend(str(tmp_path / 'club_fund.db')))
+
+    build, apply = LedgerColumns.view('date', 'method')
+    columns = cache.view('funds', 'columns', build, apply, keep_rows=False)
+    assert cache._entries['funds']['rows'] is None
+    assert list(columns.ids) == [3, 2, 1]
+    assert columns.by_month() == {'2025-01': 3000, '2025-02': 2000, '2025-03': 1000}
+
+    cache.append('funds', [{'name': 'Karim', 'amount': 500, 'date': '2025-03-15', 'method': 'bKash'}])
+    assert cache.view('funds', 'columns', build, apply, keep_rows=False).by_label() == {'Cash': 6000, 'bKash': 500}
+    assert cache._entries['funds']['rows'] is None
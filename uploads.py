@@ -0,0 +1,104 @@
+import hashlib
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from flask import url_for
+from werkzeug.utils import secure_filename
+import metrics
+
+# Screenshot uploads: the file is streamed to disk while its SHA-256 is
+# computed and stored under that hash, so the same screenshot uploaded twice
+# is kept once. Shrinking, metadata stripping and thumbnails happen on a
+# background thread after the request has returned.
+
+UPLOAD_FOLDER = 'static/uploads'
+THUMBNAIL_FOLDER = os.path.join(UPLOAD_FOLDER, 'thumbs')
+MAX_DIMENSION = 1600
+THUMBNAIL_SIZE = 320
+CHUNK_SIZE = 64 * 1024
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='uploads')
+
+def thumbnail_path(filename):
+    return os.path.join(THUMBNAIL_FOLDER, os.path.splitext(filename)[0] + '.jpg')
+
+def save_screenshot(file):
+    # Returns (filename, sha256) or (None, None) when nothing was uploaded
+    if not file or not file.filename:
+        return None, None
+
+    extension = os.path.splitext(secure_filename(file.filename))[1].lower() or '.jpg'
+    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+    tmp_path = os.path.join(UPLOAD_FOLDER, f".upload-{os.getpid()}-{os.urandom(8).hex()}")
+
+    digest = hashlib.sha256()
+    try:
+        with open(tmp_path, 'wb') as f:
+            metrics.record('file_opens')
+            while True:
+                chunk = file.stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                f.write(chunk)
+                metrics.record('bytes_written', len(chunk))
+
+        content_hash = digest.hexdigest()
+        filename = content_hash[:32] + extension
+        path = os.path.join(UPLOAD_FOLDER, filename)
+
+        if os.path.exists(path):
+            # Already stored (and processed) once
+            os.remove(tmp_path)
+            return filename, content_hash
+
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    _executor.submit(_process, path)
+    return filename, content_hash
+
+def _process(path):
+    # Pillow is optional (and slow to import, so only loaded here); without
+    # it originals are kept as uploaded
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        return
+
+    try:
+        with Image.open(path) as original:
+            image_format = original.format
+            # Apply the EXIF rotation before the metadata is dropped
+            image = ImageOps.exif_transpose(original)
+            image.load()
+
+        if image_format == 'JPEG' and image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        # Re-encoding without exif/info strips location and device metadata
+        image.thumbnail((MAX_DIMENSION, MAX_DIMENSION))
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        if image_format == 'JPEG':
+            image.save(tmp_path, 'JPEG', quality=85, optimize=True)
+        else:
+            image.save(tmp_path, image_format or 'PNG', optimize=True)
+        os.replace(tmp_path, path)
+
+        os.makedirs(THUMBNAIL_FOLDER, exist_ok=True)
+        thumbnail = image.convert('RGB')
+        thumbnail.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+        thumbnail.save(thumbnail_path(os.path.basename(path)), 'JPEG', quality=75, optimize=True)
+    except Exception:
+        logging.exception("Could not process uploaded screenshot %s", path)
+
+def screenshot_url(filename, thumbnail=False):
+    # Thumbnail when asked for and already generated, the full image otherwise
+    if not filename:
+        return None
+    if thumbnail and os.path.exists(thumbnail_path(filename)):
+        return url_for('static', filename='uploads/thumbs/' + os.path.basename(thumbnail_path(filename)))
+    return url_for('static', filename='uploads/' + filename)